@@ -6,126 +6,196 @@ This script calculates donor totals by year and pre-computes percentile threshol
 
 import os
 import sqlite3
+import sys
 import time
 
-# Optional progress bar
 try:
-    from tqdm import tqdm
+    import numpy as np
 except ImportError:
-    def tqdm(iterable, desc="Processing"):
-        print(f"{desc}...")
-        return iterable
+    np = None
+
+from ca_db_utils import (
+    DONOR_KEY_EXPR,
+    close_build_conn,
+    contributions_etag,
+    ensure_donor_key_column,
+    ensure_zip5_column,
+    get_build_etag,
+    set_build_etag,
+    tune_conn,
+    tune_read_conn,
+)
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_FILE = os.path.join(SCRIPT_DIR, "ca_contributions.db")
 
-def build_ca_donor_totals_by_year():
-    """Build the ca_donor_totals_by_year table with aggregated contributions."""
+# Shared read-only connection and per-year donor counts for get_ca_donor_percentile,
+# kept while DB_FILE still names the same unmodified file
+_read_conn = None
+_read_conn_identity = None
+_year_totals = None
+
+def build_ca_donor_totals_by_year(force=False):
+    """Build the ca_donor_totals_by_year table with aggregated contributions.
+
+    Skipped when contributions hasn't changed since the last build, unless force is set.
+    """
+    global _year_totals
     print("🔄 Building California donor totals by year...")
     
     conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
-    # Conservative pragmas for low-memory environments
-    cursor.execute('PRAGMA cache_size = -8000;')
-    cursor.execute('PRAGMA temp_store = DEFAULT;')
+    tune_conn(conn)
+    ensure_donor_key_column(conn)
+    ensure_zip5_column(conn)
 
     # Create the tables
     with open(os.path.join(SCRIPT_DIR, 'ca_percentile_tables.sql'), 'r') as f:
         cursor.executescript(f.read())
 
-    # Clear existing data
+    etag = contributions_etag(cursor)
+    if not force and get_build_etag(cursor, 'ca_donor_totals_by_year') == etag:
+        print("⏩ Contributions unchanged since the last build, keeping existing donor totals")
+        close_build_conn(conn)
+        return
+
+    # Clear existing data; the amount index is rebuilt after loading so it
+    # isn't maintained row-by-row during the bulk insert
+    cursor.execute("DROP INDEX IF EXISTS idx_ca_donor_totals_amount")
     cursor.execute("DELETE FROM ca_donor_totals_by_year")
     cursor.execute("DELETE FROM ca_percentile_thresholds_by_year")
 
-    # Build donor totals year-by-year to reduce working set size
+    # Build donor totals for all years in a single scan of contributions
     print("📊 Calculating California donor totals by year...")
     start_time = time.time()
-    total_records = 0
 
-    for year in range(2000, 2026):
-        year_start = f"{year}-01-01"
-        year_end = f"{year}-12-31"
-
-        insert_query = """
-        INSERT INTO ca_donor_totals_by_year (donor_key, year, total_amount, contribution_count, first_name, last_name, zip5)
-        SELECT
-            first_name || '|' || last_name || '|' || substr(zip_code, 1, 5) as donor_key,
-            CAST(strftime('%Y', contribution_date) as INTEGER) as year,
-            SUM(amount) as total_amount,
-            COUNT(*) as contribution_count,
-            first_name,
-            last_name,
-            substr(zip_code, 1, 5) as zip5
-        FROM contributions
-        WHERE contribution_date IS NOT NULL
-          AND contribution_date >= ?
-          AND contribution_date <= ?
-          AND first_name IS NOT NULL
-          AND last_name IS NOT NULL
-          AND zip_code IS NOT NULL
-          AND length(zip_code) >= 5
-        GROUP BY donor_key, year
-        HAVING total_amount > 0
-        """
+    insert_query = """
+    INSERT INTO ca_donor_totals_by_year (donor_key, year, total_amount, contribution_count, first_name, last_name, zip5)
+    SELECT
+        donor_key,
+        CAST(substr(contribution_date, 1, 4) as INTEGER) as year,
+        SUM(amount) as total_amount,
+        COUNT(*) as contribution_count,
+        first_name,
+        last_name,
+        zip5
+    FROM contributions
+    WHERE contribution_date IS NOT NULL
+      AND contribution_date >= ?
+      AND contribution_date <= ?
+      AND first_name IS NOT NULL
+      AND last_name IS NOT NULL
+      AND zip5 IS NOT NULL
+    GROUP BY donor_key, year
+    HAVING total_amount > 0
+    """
 
-        cursor.execute(insert_query, (year_start, year_end))
-        conn.commit()
+    # Runs in the same transaction as the DELETEs above
+    cursor.execute(insert_query, ("2000-01-01", "2025-12-31"))
+    total_records = cursor.rowcount
+    set_build_etag(cursor, 'ca_donor_totals_by_year', etag)
+    conn.commit()
 
-        cursor.execute("SELECT COUNT(*) FROM ca_donor_totals_by_year WHERE year = ?", (year,))
-        year_count = cursor.fetchone()[0]
-        total_records += year_count
-        if year_count > 0:
-            print(f"   {year}: {year_count:,} donor records")
+    # Per-year breakdown for the progress output, from one grouped index scan
+    cursor.execute("SELECT year, COUNT(*) FROM ca_donor_totals_by_year GROUP BY year ORDER BY year")
+    _year_totals = dict(cursor.fetchall())
+    for year, year_count in _year_totals.items():
+        print(f"   {year}: {year_count:,} donor records")
 
     end_time = time.time()
 
     print(f"✅ Inserted {total_records:,} California donor-year records in {end_time - start_time:.2f} seconds")
-    conn.close()
+
+    # Covering index for threshold ORDER BY scans and rank COUNT(*) lookups
+    print("🔧 Indexing donor totals by (year, total_amount)...")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_donor_totals_amount ON ca_donor_totals_by_year (year, total_amount DESC)")
+    cursor.execute("ANALYZE ca_donor_totals_by_year")
+    conn.commit()
+    close_build_conn(conn)
+
+def _store_thresholds_sql(cursor, positions):
+    """Write thresholds by ranking every year in SQL and keeping the target rows."""
+    cursor.execute("DROP TABLE IF EXISTS temp.percentile_positions")
+    cursor.execute("""
+        CREATE TEMP TABLE percentile_positions (
+            year INTEGER NOT NULL,
+            percentile INTEGER NOT NULL,
+            position INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("BEGIN")
+    cursor.executemany("INSERT INTO percentile_positions (year, percentile, position) VALUES (?, ?, ?)", positions)
+    
+    # Rank every year in one pass and keep only the rows at the target positions
+    cursor.execute("""
+        INSERT OR REPLACE INTO ca_percentile_thresholds_by_year 
+        (year, percentile, amount_threshold, donor_count_at_threshold)
+        SELECT p.year, p.percentile, t.total_amount, p.position
+        FROM (
+            SELECT year, total_amount,
+                   ROW_NUMBER() OVER (PARTITION BY year ORDER BY total_amount DESC) AS rn
+            FROM ca_donor_totals_by_year
+        ) t
+        JOIN percentile_positions p ON p.year = t.year AND p.position = t.rn
+    """)
+    return cursor.rowcount
+
+def _store_thresholds_numpy(cursor, year_counts, positions):
+    """Write thresholds using a per-year partial sort (np.partition) of the totals."""
+    positions_by_year = {}
+    for year, percentile, position in positions:
+        positions_by_year.setdefault(year, []).append((percentile, position))
+    
+    # Load every year's totals in one scan; year_counts is ordered by year, so
+    # each year's slice starts at the running total of the earlier counts
+    counts = [total_donors for _, total_donors in year_counts]
+    cursor.execute("SELECT total_amount FROM ca_donor_totals_by_year ORDER BY year")
+    all_amounts = np.fromiter((row[0] for row in cursor), dtype=np.float64, count=sum(counts))
+    year_offsets = np.concatenate(([0], np.cumsum(counts)))
+    
+    thresholds = []
+    for (year, total_donors), start in zip(year_counts, year_offsets):
+        amounts = all_amounts[start:start + total_donors]
+        # Rank k in descending order is index N-k in ascending order
+        year_positions = positions_by_year[year]
+        amounts.partition([total_donors - position for _, position in year_positions])
+        for percentile, position in year_positions:
+            thresholds.append((year, percentile, float(amounts[total_donors - position]), position))
+    
+    cursor.executemany("""
+        INSERT OR REPLACE INTO ca_percentile_thresholds_by_year 
+        (year, percentile, amount_threshold, donor_count_at_threshold)
+        VALUES (?, ?, ?, ?)
+    """, thresholds)
+    return len(thresholds)
 
 def build_ca_percentile_thresholds():
     """Calculate and store percentile thresholds for each year."""
     print("🔄 Building California percentile thresholds...")
     
     conn = sqlite3.connect(DB_FILE)
+    tune_conn(conn)
     cursor = conn.cursor()
     
-    # Get all years with data
-    cursor.execute("SELECT DISTINCT year FROM ca_donor_totals_by_year ORDER BY year")
-    years = [row[0] for row in cursor.fetchall()]
+    # Get donor counts for all years with data
+    cursor.execute("SELECT year, COUNT(*) FROM ca_donor_totals_by_year GROUP BY year ORDER BY year")
+    year_counts = cursor.fetchall()
     
     percentiles = [1, 5, 10, 25, 50, 75, 90, 95, 99]
     
-    for year in tqdm(years, desc="Processing years"):
-        # Get total donor count for this year
-        cursor.execute("SELECT COUNT(*) FROM ca_donor_totals_by_year WHERE year = ?", (year,))
-        total_donors = cursor.fetchone()[0]
-        
-        for percentile in percentiles:
-            # Calculate the position for this percentile
-            position = int((percentile / 100.0) * total_donors)
-            if position == 0:
-                position = 1
-            
-            # Get the amount at this percentile position
-            cursor.execute("""
-                SELECT total_amount 
-                FROM ca_donor_totals_by_year 
-                WHERE year = ? 
-                ORDER BY total_amount DESC 
-                LIMIT 1 OFFSET ?
-            """, (year, position - 1))
-            
-            result = cursor.fetchone()
-            if result:
-                threshold_amount = result[0]
-                
-                # Insert the threshold
-                cursor.execute("""
-                    INSERT OR REPLACE INTO ca_percentile_thresholds_by_year 
-                    (year, percentile, amount_threshold, donor_count_at_threshold)
-                    VALUES (?, ?, ?, ?)
-                """, (year, percentile, threshold_amount, position))
+    # Rank position for each (year, percentile), 1-based and never 0
+    positions = [
+        (year, percentile, int((percentile / 100.0) * total_donors) or 1)
+        for year, total_donors in year_counts
+        for percentile in percentiles
+    ]
+    
+    if np is not None:
+        stored = _store_thresholds_numpy(cursor, year_counts, positions)
+    else:
+        stored = _store_thresholds_sql(cursor, positions)
+    print(f"   Stored {stored:,} thresholds across {len(year_counts)} years")
     
     conn.commit()
     
@@ -162,51 +232,99 @@ def build_ca_percentile_thresholds():
         else:
             print("   No percentile data available")
     
-    conn.close()
+    close_build_conn(conn)
+
+def build_ca_donor_rank_by_year(force=False):
+    """Materialize each donor's rank and the donor count per year from ca_donor_totals_by_year.
+
+    Skipped when contributions hasn't changed since the last build, unless force is set.
+    """
+    print("🔄 Building California donor ranks by year...")
+    
+    conn = sqlite3.connect(DB_FILE)
+    tune_conn(conn)
+    cursor = conn.cursor()
+    
+    with open(os.path.join(SCRIPT_DIR, 'ca_percentile_tables.sql'), 'r') as f:
+        cursor.executescript(f.read())
+    
+    etag = contributions_etag(cursor)
+    if not force and get_build_etag(cursor, 'ca_donor_rank_by_year') == etag:
+        print("⏩ Contributions unchanged since the last build, keeping existing donor ranks")
+        close_build_conn(conn)
+        return
+    
+    start_time = time.time()
+    cursor.execute("DELETE FROM ca_donor_rank_by_year")
+    cursor.execute("""
+        INSERT INTO ca_donor_rank_by_year
+        (donor_key, year, rank, total_donors, total_amount, contribution_count)
+        SELECT donor_key, year,
+               RANK() OVER (PARTITION BY year ORDER BY total_amount DESC),
+               COUNT(*) OVER (PARTITION BY year),
+               total_amount, contribution_count
+        FROM ca_donor_totals_by_year
+    """)
+    total_records = cursor.rowcount
+    set_build_etag(cursor, 'ca_donor_rank_by_year', etag)
+    conn.commit()
+    close_build_conn(conn)
+    
+    print(f"✅ Ranked {total_records:,} California donor-year records in {time.time() - start_time:.2f} seconds")
+
+def _db_file_identity():
+    """(path, inode, mtime) of DB_FILE; a rebuild, swap or repointed DB_FILE changes it."""
+    try:
+        st = os.stat(DB_FILE)
+    except OSError:
+        return None
+    return DB_FILE, st.st_ino, st.st_mtime_ns
+
+def _get_read_conn():
+    """The read-only connection used for single-donor lookups, reopened when DB_FILE changes."""
+    global _read_conn, _read_conn_identity, _year_totals
+    identity = _db_file_identity()
+    if _read_conn is None or identity != _read_conn_identity:
+        # Not closed here: another thread may still be reading from the old connection
+        _read_conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+        tune_read_conn(_read_conn)
+        _read_conn_identity = identity
+        _year_totals = None
+    return _read_conn
+
+def _get_year_totals(cursor):
+    """Number of donors per year from ca_donor_totals_by_year, loaded once per connection."""
+    global _year_totals
+    if _year_totals is None:
+        cursor.execute("SELECT year, COUNT(*) FROM ca_donor_totals_by_year GROUP BY year")
+        _year_totals = dict(cursor.fetchall())
+    return _year_totals
 
 def get_ca_donor_percentile(first_name, last_name, zip5, year):
     """
     Get the percentile ranking for a specific California donor in a given year.
     Returns the percentile (1-100) where higher = better rank.
     """
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    cursor = _get_read_conn().cursor()
     
     donor_key = f"{first_name}|{last_name}|{zip5}"
     
-    # Get this donor's total for the year
+    # This donor's total and how many donors gave more, in one round-trip
     cursor.execute("""
-        SELECT total_amount 
-        FROM ca_donor_totals_by_year 
-        WHERE donor_key = ? AND year = ?
+        SELECT donor.total_amount,
+               (SELECT COUNT(*)
+                FROM ca_donor_totals_by_year
+                WHERE year = donor.year AND total_amount > donor.total_amount) as donors_above
+        FROM ca_donor_totals_by_year donor
+        WHERE donor.donor_key = ? AND donor.year = ?
     """, (donor_key, year))
     
     result = cursor.fetchone()
     if not result:
-        conn.close()
         return None, None
     
-    donor_amount = result[0]
-    
-    # Count how many donors gave more than this donor
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM ca_donor_totals_by_year 
-        WHERE year = ? AND total_amount > ?
-    """, (year, donor_amount))
-    
-    donors_above = cursor.fetchone()[0]
-    
-    # Get total donor count for the year
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM ca_donor_totals_by_year 
-        WHERE year = ?
-    """, (year,))
-    
-    total_donors = cursor.fetchone()[0]
-    
-    conn.close()
+    donors_above = result[1]
+    total_donors = _get_year_totals(cursor)[int(year)]
     
     # Calculate percentile (higher percentile = better rank)
     percentile = ((total_donors - donors_above) / total_donors) * 100
@@ -228,33 +346,24 @@ def show_ca_database_stats():
         conn.close()
         return
     
-    # Total contributions
-    cursor.execute("SELECT COUNT(*), SUM(amount) FROM contributions")
-    contrib_count, total_amount = cursor.fetchone()
+    # Read-only: use donor_key if a build already added it, without altering the table here
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    has_donor_key = any(row[1] == 'donor_key' for row in cursor.fetchall())
+    donor_key = 'donor_key' if has_donor_key else DONOR_KEY_EXPR
+    
+    # All summary figures in a single scan of contributions
+    cursor.execute(f"""
+        SELECT COUNT(*), SUM(amount),
+               MIN(contribution_date), MAX(contribution_date),
+               COUNT(DISTINCT {donor_key}),
+               COUNT(DISTINCT substr(contribution_date, 1, 4))
+        FROM contributions
+    """)
+    contrib_count, total_amount, min_date, max_date, unique_donors, years_count = cursor.fetchone()
     print(f"   Total contributions: {contrib_count:,}")
     print(f"   Total amount: ${total_amount:,.2f}")
-    
-    # Date range
-    cursor.execute("SELECT MIN(contribution_date), MAX(contribution_date) FROM contributions WHERE contribution_date IS NOT NULL")
-    min_date, max_date = cursor.fetchone()
     print(f"   Date range: {min_date} to {max_date}")
-    
-    # Unique donors
-    cursor.execute("""
-        SELECT COUNT(DISTINCT first_name || '|' || last_name || '|' || substr(zip_code, 1, 5))
-        FROM contributions 
-        WHERE first_name IS NOT NULL AND last_name IS NOT NULL AND zip_code IS NOT NULL
-    """)
-    unique_donors = cursor.fetchone()[0]
     print(f"   Unique donors: {unique_donors:,}")
-    
-    # Years with data
-    cursor.execute("""
-        SELECT COUNT(DISTINCT strftime('%Y', contribution_date))
-        FROM contributions 
-        WHERE contribution_date IS NOT NULL
-    """)
-    years_count = cursor.fetchone()[0]
     print(f"   Years with data: {years_count}")
     
     conn.close()
@@ -265,12 +374,15 @@ if __name__ == "__main__":
     # Show current database stats
     show_ca_database_stats()
     
-    # Step 1: Build donor totals
-    build_ca_donor_totals_by_year()
+    # Step 1: Build donor totals (pass --force to rebuild even if contributions is unchanged)
+    build_ca_donor_totals_by_year(force='--force' in sys.argv)
     
     # Step 2: Calculate percentile thresholds
     build_ca_percentile_thresholds()
     
+    # Step 3: Materialize per-donor ranks for the web app lookups
+    build_ca_donor_rank_by_year(force='--force' in sys.argv)
+    
     print("\n🎉 California percentile tables built successfully!")
     
     # Test the lookup function
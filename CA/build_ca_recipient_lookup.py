@@ -6,41 +6,140 @@ This script creates a pre-aggregated table of California recipient statistics.
 
 import os
 import sqlite3
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from ca_db_utils import (
+    close_build_conn,
+    contributions_etag,
+    ensure_donor_key_column,
+    get_build_etag,
+    register_approx_distinct,
+    set_build_etag,
+    tune_conn,
+    tune_read_conn,
+)
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "ca_contributions.db")
 
+# Set CA_APPROX_DISTINCT=1 to estimate contributor_count with a HyperLogLog
+# sketch instead of an exact COUNT(DISTINCT donor_key)
+APPROX_DISTINCT = os.environ.get('CA_APPROX_DISTINCT', '') == '1'
+CONTRIBUTOR_COUNT_EXPR = "hll_distinct(c.donor_key)" if APPROX_DISTINCT else "COUNT(DISTINCT c.donor_key)"
+
+# Per-recipient statistics for one recipient_committee_id range; parameters are
+# (recent_cutoff, recent_cutoff, range_start, range_end)
+AGGREGATION_QUERY = f"""
+    WITH recipient_stats AS (
+        SELECT
+            c.recipient_committee_id,
+            COUNT(*) as total_contributions,
+            SUM(c.amount) as total_amount,
+            TOTAL(c.contribution_date >= ?) as recent_contributions,
+            TOTAL(CASE WHEN c.contribution_date >= ? THEN c.amount END) as recent_amount,
+            MIN(c.contribution_date) as first_contribution_date,
+            MAX(c.contribution_date) as last_contribution_date,
+            {CONTRIBUTOR_COUNT_EXPR} as contributor_count
+        FROM contributions c
+        WHERE c.recipient_committee_id IS NOT NULL
+          AND c.recipient_committee_id != ''
+          AND c.recipient_committee_id >= ? AND c.recipient_committee_id < ?
+        GROUP BY c.recipient_committee_id
+    )
+    -- Committee details are joined onto the aggregated rows, not every contribution
+    SELECT
+        rs.recipient_committee_id as recipient_name,
+        COALESCE(cm.name, rs.recipient_committee_id) as display_name,
+        COALESCE(cm.committee_type, '') as committee_type,
+        COALESCE(cm.entity_code, '') as entity_code,
+        cm.city,
+        cm.state,
+        cm.zip_code,
+        cm.phone,
+        cm.email,
+        cm.candidate_last_name,
+        cm.candidate_first_name,
+        cm.office_description,
+        cm.jurisdiction_description,
+        rs.total_contributions, rs.total_amount,
+        rs.recent_contributions, rs.recent_amount,
+        rs.first_contribution_date, rs.last_contribution_date,
+        rs.contributor_count, datetime('now')
+    FROM recipient_stats rs
+    LEFT JOIN committees cm ON cm.committee_id = rs.recipient_committee_id
+"""
+
+INSERT_QUERY = """
+    INSERT INTO ca_recipient_lookup (
+        recipient_name, display_name, committee_type, entity_code,
+        city, state, zip_code, phone, email,
+        candidate_last_name, candidate_first_name,
+        office_description, jurisdiction_description,
+        total_contributions, total_amount,
+        recent_contributions, recent_amount,
+        first_contribution_date, last_contribution_date,
+        contributor_count, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
 def get_recent_date_cutoff():
     """Get date cutoff for 'recent' contributions (365 days ago)"""
     cutoff = datetime.now() - timedelta(days=365)
     return cutoff.strftime('%Y-%m-%d')
 
-def build_ca_recipient_lookup():
-    """Build the California recipient lookup table with aggregated statistics"""
+def aggregate_recipient_range(range_start, range_end, recent_cutoff):
+    """Aggregate recipient statistics for one recipient_committee_id range.
+
+    Runs on its own connection so several ranges can be scanned at once;
+    SQLite releases the GIL while a statement is executing.
+    """
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    try:
+        tune_read_conn(conn)
+        if APPROX_DISTINCT:
+            register_approx_distinct(conn)
+        cursor = conn.cursor()
+        cursor.execute(AGGREGATION_QUERY, (recent_cutoff, recent_cutoff, range_start, range_end))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+def build_ca_recipient_lookup(force=False):
+    """Build the California recipient lookup table with aggregated statistics
+
+    Skipped when contributions, committees and the recent cutoff are all
+    unchanged since the last build, unless force is set.
+    """
     print("🚀 Building California recipient lookup table...")
     
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    # Conservative pragmas for low-memory environments
-    cursor.execute('PRAGMA cache_size = -8000;')
-    cursor.execute('PRAGMA temp_store = DEFAULT;')
+    tune_conn(conn)
+    ensure_donor_key_column(conn)
 
     # First, create the tables
     print("📋 Creating California recipient lookup table...")
     with open(os.path.join(SCRIPT_DIR, "ca_recipient_lookup_table.sql"), 'r') as f:
-        cursor.executescript(f.read())
-
-    # Clear existing data
-    cursor.execute("DELETE FROM ca_recipient_lookup")
-    cursor.execute("DELETE FROM ca_recipient_lookup_fts")
+        schema_sql = f.read()
+    cursor.executescript(schema_sql)
 
     # Get recent date cutoff
     recent_cutoff = get_recent_date_cutoff()
     print(f"📅 Using recent activity cutoff: {recent_cutoff}")
 
+    cursor.execute("SELECT MAX(rowid), COUNT(*) FROM committees")
+    committees_max_rowid, committees_count = cursor.fetchone()
+    etag = (f"{contributions_etag(cursor)}|{committees_max_rowid}:{committees_count}"
+            f"|{recent_cutoff}|{CONTRIBUTOR_COUNT_EXPR}")
+    if not force and get_build_etag(cursor, 'ca_recipient_lookup') == etag:
+        print("⏩ Source data unchanged since the last build, keeping existing recipient lookup")
+        close_build_conn(conn)
+        return
+
     # Build the aggregated data in batches by recipient_committee_id prefix
     print("📊 Aggregating California recipient statistics in batches...")
 
@@ -59,79 +158,42 @@ def build_ca_recipient_lookup():
     start_time = time.time()
     total_inserted = 0
 
-    for range_start, range_end in prefix_ranges:
-        aggregation_query = """
-            WITH recipient_stats AS (
-                SELECT
-                    c.recipient_committee_id as recipient_name,
-                    COALESCE(cm.name, c.recipient_committee_id) as display_name,
-                    COALESCE(cm.committee_type, '') as committee_type,
-                    COALESCE(cm.entity_code, '') as entity_code,
-                    cm.city,
-                    cm.state,
-                    cm.zip_code,
-                    cm.phone,
-                    cm.email,
-                    cm.candidate_last_name,
-                    cm.candidate_first_name,
-                    cm.office_description,
-                    cm.jurisdiction_description,
-                    COUNT(*) as total_contributions,
-                    SUM(c.amount) as total_amount,
-                    SUM(CASE WHEN c.contribution_date >= ? THEN 1 ELSE 0 END) as recent_contributions,
-                    SUM(CASE WHEN c.contribution_date >= ? THEN c.amount ELSE 0 END) as recent_amount,
-                    MIN(c.contribution_date) as first_contribution_date,
-                    MAX(c.contribution_date) as last_contribution_date,
-                    COUNT(DISTINCT c.first_name || '|' || c.last_name || '|' || substr(c.zip_code, 1, 5)) as contributor_count
-                FROM contributions c
-                LEFT JOIN committees cm ON c.recipient_committee_id = cm.committee_id
-                WHERE c.recipient_committee_id IS NOT NULL
-                  AND c.recipient_committee_id != ''
-                  AND c.recipient_committee_id >= ? AND c.recipient_committee_id < ?
-                GROUP BY c.recipient_committee_id, display_name, committee_type, cm.entity_code,
-                         cm.city, cm.state, cm.zip_code, cm.phone, cm.email,
-                         cm.candidate_last_name, cm.candidate_first_name,
-                         cm.office_description, cm.jurisdiction_description
-            )
-            INSERT INTO ca_recipient_lookup (
-                recipient_name, display_name, committee_type, entity_code,
-                city, state, zip_code, phone, email,
-                candidate_last_name, candidate_first_name,
-                office_description, jurisdiction_description,
-                total_contributions, total_amount,
-                recent_contributions, recent_amount,
-                first_contribution_date, last_contribution_date,
-                contributor_count, updated_at
-            )
-            SELECT
-                recipient_name, display_name, committee_type, entity_code,
-                city, state, zip_code, phone, email,
-                candidate_last_name, candidate_first_name,
-                office_description, jurisdiction_description,
-                total_contributions, total_amount,
-                recent_contributions, recent_amount,
-                first_contribution_date, last_contribution_date,
-                contributor_count, datetime('now')
-            FROM recipient_stats
-        """
-
-        cursor.execute(aggregation_query, (recent_cutoff, recent_cutoff, range_start, range_end))
-        conn.commit()
-        batch_count = cursor.rowcount
-        total_inserted += batch_count
-        print(f"   Batch {range_start}-{chr(ord(range_end)-1)}: {batch_count:,} recipients")
+    # Clear and rebuild inside one write transaction, committed once at the end.
+    # WAL lets the worker connections keep reading while this one holds the write lock.
+    cursor.execute("BEGIN IMMEDIATE")
+    # The FTS index is rebuilt in one pass after loading, so drop the sync
+    # triggers instead of tokenizing row by row; the schema script restores them
+    cursor.execute("DROP TRIGGER IF EXISTS ca_recipient_lookup_fts_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS ca_recipient_lookup_fts_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS ca_recipient_lookup_fts_update")
+    cursor.execute("DELETE FROM ca_recipient_lookup")
 
-    end_time = time.time()
-    elapsed = end_time - start_time
+    max_workers = min(len(prefix_ranges), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(aggregate_recipient_range, range_start, range_end, recent_cutoff)
+            for range_start, range_end in prefix_ranges
+        ]
+        for (range_start, range_end), future in zip(prefix_ranges, futures):
+            rows = future.result()
+            cursor.executemany(INSERT_QUERY, rows)
+            batch_count = len(rows)
+            total_inserted += batch_count
+            print(f"   Batch {range_start}-{chr(ord(range_end)-1)}: {batch_count:,} recipients")
 
-    # Get count of records inserted
-    cursor.execute("SELECT COUNT(*) FROM ca_recipient_lookup")
-    record_count = cursor.fetchone()[0]
+    print("🔍 Rebuilding full-text search index...")
+    cursor.execute("INSERT INTO ca_recipient_lookup_fts(ca_recipient_lookup_fts) VALUES('rebuild')")
+    cursor.execute("INSERT INTO ca_recipient_lookup_fts(ca_recipient_lookup_fts) VALUES('optimize')")
 
-    print(f"✅ Aggregated {record_count:,} California recipients in {elapsed:.2f} seconds")
+    end_time = time.time()
+    elapsed = end_time - start_time
 
-    # Commit the changes
+    # Commit the changes, then recreate the FTS sync triggers
+    set_build_etag(cursor, 'ca_recipient_lookup', etag)
     conn.commit()
+    cursor.executescript(schema_sql)
+
+    print(f"✅ Aggregated {total_inserted:,} California recipients in {elapsed:.2f} seconds")
     
     # Show some sample data
     print("\n📋 Sample California recipient data:")
@@ -174,7 +236,7 @@ def build_ca_recipient_lookup():
         display_name, candidate_name, office, total_contrib, total_amt = row
         print(f"  {candidate_name[:25]:<25} | {office[:20]:<20} | {total_contrib:,} contrib, ${total_amt:,.2f}")
     
-    conn.close()
+    close_build_conn(conn)
     print("\n🎉 California recipient lookup table built successfully!")
 
 def show_ca_recipient_stats():
@@ -228,8 +290,8 @@ if __name__ == "__main__":
     # Show current database stats first
     show_ca_recipient_stats()
     
-    # Build the lookup table
-    build_ca_recipient_lookup()
+    # Build the lookup table (pass --force to rebuild even if the source data is unchanged)
+    build_ca_recipient_lookup(force='--force' in sys.argv)
     
     # Show final stats
     show_ca_recipient_stats()
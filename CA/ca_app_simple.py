@@ -4,36 +4,75 @@ California Campaign Contributions Web Application
 Simplified version with core functionality
 """
 
-from flask import Flask, request, render_template_string
+from flask import Flask, request, render_template
 import sqlite3
 import math
 from urllib.parse import urlencode, quote_plus
 import argparse
 import os
-import pprint
+import logging
+import sys
+import threading
+import bisect
+from array import array
 from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+import tempfile
+import time
+import queue
+from jinja2 import FileSystemBytecodeCache
+from jinja2.filters import do_urlencode
 
 app = Flask(__name__)
+# Templates live in CA/templates. Compiled templates stay in the environment's
+# cache, and their bytecode is kept on disk so a restart skips recompiling.
+JINJA_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ca_jinja_cache")
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, "cache_size": 400,
+                     "bytecode_cache": FileSystemBytecodeCache(JINJA_CACHE_DIR)}
 # Use DB path relative to this file so the CA app always points to the CA database
 DB_PATH = os.path.join(os.path.dirname(__file__), "ca_contributions.db")
 PAGE_SIZE = 50
 PERSON_SEARCH_PAGE_SIZE = 10  # Specific page size for recent contributions on person page
 
-# Jinja2 filters
+# Jinja2 filters; contribution amounts repeat heavily, so formatted strings are memoized
+@lru_cache(maxsize=4096)
 def format_currency(value):
     if value is None: return "$0.00"
-    return "${:,.2f}".format(value)
+    return f"${value:,.2f}"
 
+@lru_cache(maxsize=4096)
 def format_comma(value):
     if value is None: return "0"
-    return "{:,}".format(int(value))
+    return f"{int(value):,}"
+
+@lru_cache(maxsize=4096)
+def _qp(value):
+    """quote_plus, memoized: the same names and recipients recur across rows and requests."""
+    return quote_plus(value)
+
+@lru_cache(maxsize=4096)
+def _cached_urlencode(value):
+    return do_urlencode(value)
+
+def cached_urlencode(value):
+    """The urlencode filter, memoized for strings: each search row encodes its city/state/ZIP twice."""
+    if isinstance(value, str):
+        return _cached_urlencode(value)
+    return do_urlencode(value)
 
 app.jinja_env.filters['currency'] = format_currency
 app.jinja_env.filters['comma'] = format_comma
-app.jinja_env.filters['quote_plus'] = quote_plus
+app.jinja_env.filters['quote_plus'] = _qp
+app.jinja_env.filters['urlencode'] = cached_urlencode
 app.jinja_env.globals['min'] = min
 app.jinja_env.globals['max'] = max
 
+# CA query parameter -> national app query parameter
+FEC_PARAM_NAMES = {key: key for key in ("first_name", "last_name", "city", "state", "zip_code",
+                                       "year", "sort_by", "order", "name_query")}
+FEC_PARAM_NAMES.update({"first": "first_name", "last": "last_name", "zip": "zip_code"})
+
 # Helper function to build national FEC app URLs with preserved parameters
 def build_fec_app_url(route="/", params=None):
     """Build URL for national FEC app with preserved search parameters."""
@@ -43,14 +82,9 @@ def build_fec_app_url(route="/", params=None):
     # Map CA parameters to national app parameters
     fec_params = {}
     for key, value in params.items():
-        if key in ["first_name", "last_name", "city", "state", "zip_code", "year", "sort_by", "order", "name_query"]:
-            fec_params[key] = value
-        elif key == "first":
-            fec_params["first_name"] = value
-        elif key == "last":
-            fec_params["last_name"] = value
-        elif key == "zip":
-            fec_params["zip_code"] = value
+        fec_key = FEC_PARAM_NAMES.get(key)
+        if fec_key:
+            fec_params[fec_key] = value
     
     base_url = f"http://localhost:5000{route}"
     if fec_params:
@@ -97,8 +131,209 @@ KNOWN_CA_CONDUITS = [
     "WinRed"  # May also appear in CA data
 ]
 
+_local = threading.local()
+
+# update_calaccess.py swaps a rebuilt file in over DB_PATH. Each time the file's identity
+# changes the generation is bumped: per-thread connections reopen and data-derived caches reset.
+_db_generation = 0
+_db_identity = None
+_db_generation_lock = threading.Lock()
+
+# filing_id -> (committee_name, committee_type), loaded by get_db() once per generation so pages resolve names without a join
+FC_MAP = None
+_fc_map_generation = None
+_fc_map_lock = threading.Lock()
+
+def load_fc_map(conn, generation):
+    """Read filing_committee_mapping into FC_MAP and expose it to templates."""
+    global FC_MAP, _fc_map_generation
+    with _fc_map_lock:
+        if _fc_map_generation != generation:
+            try:
+                rows = conn.execute("SELECT filing_id, committee_name, committee_type FROM filing_committee_mapping")
+                fc_map = {filing_id: (name, ctype) for filing_id, name, ctype in rows}
+            except sqlite3.OperationalError:
+                fc_map = {}
+            # Swapped in whole, so requests already holding the old map keep a consistent one
+            FC_MAP = fc_map
+            _fc_map_generation = generation
+            app.jinja_env.globals['FC_MAP'] = FC_MAP
+    return FC_MAP
+
+def format_committee_name(committee_id):
+    """Committee name for a filing ID, or a placeholder when the mapping has none."""
+    entry = (FC_MAP or {}).get(committee_id)
+    if entry and entry[0] is not None:
+        return entry[0]
+    return f"Committee ID: {committee_id}"
+
+app.jinja_env.filters['committee_name'] = format_committee_name
+
+def _conduit_filter():
+    """WHERE clause excluding contributions to KNOWN_CA_CONDUITS; the subquery runs once per statement."""
+    conduit_placeholders = ",".join(["?"] * len(KNOWN_CA_CONDUITS))
+    return ("(c.recipient_committee_id IS NULL OR c.recipient_committee_id NOT IN "
+            f"(SELECT filing_id FROM filing_committee_mapping WHERE committee_name IN ({conduit_placeholders})))")
+
+def init_db_pragmas(conn):
+    """Tune a new connection for the app's read-heavy workload."""
+    # The journal mode is left as the build wrote it; the app doesn't switch the live file
+    # to WAL, since update_calaccess.py swaps it out and deletes the -wal/-shm files
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA mmap_size = 1073741824")  # 1 GB
+    cursor.execute("PRAGMA cache_size = -131072")  # 128 MB
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    # Request handlers only read; any stray write fails instead of taking the write lock
+    cursor.execute("PRAGMA query_only = 1")
+
+def _db_file_identity():
+    """(inode, mtime) of DB_PATH; a swapped-in or rewritten file changes it."""
+    try:
+        st = os.stat(DB_PATH)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+def _reset_db_caches():
+    """Forget everything read from the previous database file."""
+    for cached in (_contribution_columns, _table_exists, _table_has_rows, _build_search_sql,
+                   _person_recent_sql, _person_cascade_sql, _contributor_totals, _recipient_donor_count,
+                   _committee_totals):
+        cached.cache_clear()
+    _YEAR_AMOUNTS.clear()
+
+def current_db_generation():
+    """The database generation, bumped (and caches reset) when DB_PATH no longer matches the file last seen."""
+    global _db_generation, _db_identity
+    identity = _db_file_identity()
+    if identity != _db_identity:
+        with _db_generation_lock:
+            if identity != _db_identity:
+                _db_identity = identity
+                _db_generation += 1
+                _reset_db_caches()
+    return _db_generation
+
+@app.before_request
+def check_db_generation():
+    """Notice a swapped database file before a request reads any cached lookup."""
+    current_db_generation()
+
 def get_db():
-    return sqlite3.connect(DB_PATH)
+    """Return this thread's connection, opening it on first use and reopening it after the file is swapped."""
+    generation = current_db_generation()
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != generation:
+        # The old connection isn't closed here: cursors still streaming from it keep it alive,
+        # and it closes once they are gone
+        # Statement cache sized for every filter/sort permutation the SQL builders can emit
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        init_db_pragmas(conn)
+        _local.conn, _local.generation = conn, generation
+    if _fc_map_generation != generation:
+        load_fc_map(conn, generation)
+    return conn
+
+# Indexes the routes rely on, created at startup for databases built before process_ca.py added them
+APP_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_ca_recipient_name ON contributions (recipient_committee_id, first_name, last_name)",
+    "CREATE INDEX IF NOT EXISTS idx_ca_recipient_date_amount ON contributions (recipient_committee_id, contribution_date DESC, amount DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_ca_recipient_amount_date ON contributions (recipient_committee_id, amount DESC, contribution_date DESC)",
+    # Person search cascade levels; need the *_u columns from ensure_upper_columns
+    "CREATE INDEX IF NOT EXISTS idx_ca_person_zip ON contributions (last_name_u, first_name_u, state_u, city_u, zip5, contribution_date)",
+    "CREATE INDEX IF NOT EXISTS idx_ca_person_state ON contributions (last_name_u, first_name_u, state_u, contribution_date)",
+    # /contributor pages in date order straight off this index
+    "CREATE INDEX IF NOT EXISTS idx_ca_name_u_date ON contributions (last_name_u, first_name_u, contribution_date)",
+]
+
+def init_db():
+    """One-time setup of the database file before serving."""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        for idx_sql in APP_INDEXES:
+            try:
+                conn.execute(idx_sql)
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not prepare database {DB_PATH}: {e}")
+        conn.commit()
+    finally:
+        conn.close()
+
+@lru_cache(maxsize=1)
+def _contribution_columns():
+    """Column names of contributions, including generated ones, read once per process."""
+    cursor = get_db().cursor()
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    return frozenset(row[1] for row in cursor.fetchall())
+
+def _ci_equals(column):
+    """Case-insensitive equality on a contributions column; bind the value upper-cased.
+
+    Uses the indexed upper-case copy (first_name_u etc., see ensure_upper_columns)
+    when the database has it, otherwise falls back to COLLATE NOCASE.
+    """
+    if f"{column}_u" in _contribution_columns():
+        return f"c.{column}_u = ?"
+    return f"c.{column} = ? COLLATE NOCASE"
+
+def _zip_filter(zip_input):
+    """WHERE clause and bind values for contributions whose ZIP starts with the digits of zip_input.
+
+    Five or more digits is an equality probe on the indexed zip5 column and
+    shorter fragments a GLOB prefix range on it; databases without zip5 get
+    the same GLOB prefix on zip_code. Digits need no GLOB escaping.
+    """
+    zip_digits = "".join(ch for ch in zip_input if ch.isdigit())[:5]
+    if "zip5" not in _contribution_columns():
+        return "c.zip_code GLOB ?", [zip_digits + "*"]
+    if len(zip_digits) == 5:
+        return "c.zip5 = ?", [zip_digits]
+    return "c.zip5 GLOB ?", [zip_digits + "*"]
+
+def _committee_name_filter(name_query):
+    """WHERE clause and bind value matching filing_committee_mapping names that contain name_query.
+
+    Uses the trigram index fcm_fts (built by fix_committee_mapping.py) when present; fragments
+    shorter than a trigram fall back to a LIKE scan.
+    """
+    if len(name_query) >= 3 and _table_exists("fcm_fts"):
+        phrase = '"' + name_query.replace('"', '""') + '"'
+        return "rowid IN (SELECT rowid FROM fcm_fts WHERE fcm_fts MATCH ?)", phrase
+    return "committee_name LIKE ?", f"%{name_query}%"
+
+@lru_cache(maxsize=None)
+def _table_exists(name):
+    """Whether a table exists in the database; the schema doesn't change while the app runs."""
+    cursor = get_db().cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,))
+    return cursor.fetchone() is not None
+
+@lru_cache(maxsize=None)
+def _table_has_rows(name):
+    """Whether a table exists and holds any rows; ca_percentile_tables.sql creates tables before they are built."""
+    if not _table_exists(name):
+        return False
+    cursor = get_db().cursor()
+    cursor.execute(f"SELECT 1 FROM {name} LIMIT 1")
+    return cursor.fetchone() is not None
+
+# Per-year donor totals sorted ascending, loaded lazily; they only change when the tables are rebuilt
+_YEAR_AMOUNTS = {}
+_year_amounts_lock = threading.Lock()
+
+def _year_amounts(year):
+    """Sorted donor totals for one year from ca_donor_totals_by_year, cached for the process."""
+    amounts = _YEAR_AMOUNTS.get(year)
+    if amounts is None:
+        with _year_amounts_lock:
+            amounts = _YEAR_AMOUNTS.get(year)
+            if amounts is None:
+                cursor = get_db().cursor()
+                cursor.execute("SELECT total_amount FROM ca_donor_totals_by_year WHERE year = ? ORDER BY total_amount", (year,))
+                amounts = array('d', (row[0] for row in cursor))
+                _YEAR_AMOUNTS[year] = amounts
+    return amounts
 
 def get_ca_donor_percentiles_by_year(first_name, last_name, zip_code):
     """Get percentile rankings for a CA donor across all years they have data."""
@@ -108,15 +343,35 @@ def get_ca_donor_percentiles_by_year(first_name, last_name, zip_code):
     zip5 = zip_code[:5]
     donor_key = f"{first_name}|{last_name}|{zip5}"
     
+    # Check if percentile tables exist
+    has_rank_table = _table_has_rows("ca_donor_rank_by_year")
+    if not has_rank_table and not _table_exists("ca_donor_totals_by_year"):
+        return {}
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    # Check if percentile tables exist
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ca_donor_totals_by_year'")
-    if not cursor.fetchone():
-        conn.close()
-        return {}
+    # Prefer the ranks precomputed by build_ca_percentile_tables.py: one indexed lookup, no ranking work
+    if has_rank_table:
+        cursor.execute("""
+            SELECT year, rank, total_donors, total_amount, contribution_count
+            FROM ca_donor_rank_by_year
+            WHERE donor_key = ?
+            ORDER BY year DESC
+        """, (donor_key,))
+        
+        percentiles = {}
+        for year, rank, total_donors, total_amount, contrib_count in cursor.fetchall():
+            percentiles[year] = {
+                "percentile": ((total_donors - rank + 1) / total_donors) * 100,
+                "rank": rank,
+                "total_amount": total_amount,
+                "contribution_count": contrib_count,
+                "total_donors": total_donors
+            }
+        return percentiles
     
+    # Fallback: rank against the year's cached sorted totals
     cursor.execute("""
         SELECT year, total_amount, contribution_count
         FROM ca_donor_totals_by_year 
@@ -124,45 +379,69 @@ def get_ca_donor_percentiles_by_year(first_name, last_name, zip_code):
         ORDER BY year DESC
     """, (donor_key,))
     
-    donor_years = cursor.fetchall()
-    if not donor_years:
-        conn.close()
-        return {}
-    
     percentiles = {}
     
-    for year, total_amount, contrib_count in donor_years:
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM ca_donor_totals_by_year 
-            WHERE year = ? AND total_amount > ?
-        """, (year, total_amount))
-        
-        donors_above = cursor.fetchone()[0]
-        
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM ca_donor_totals_by_year 
-            WHERE year = ?
-        """, (year,))
-        
-        total_donors = cursor.fetchone()[0]
-        
-        if total_donors > 0:
-            percentile = ((total_donors - donors_above) / total_donors) * 100
-            rank = donors_above + 1
-            
-            percentiles[year] = {
-                "percentile": percentile,
-                "rank": rank,
-                "total_amount": total_amount,
-                "contribution_count": contrib_count,
-                "total_donors": total_donors
-            }
+    for year, total_amount, contrib_count in cursor.fetchall():
+        # Rank is one more than the number of donors who gave strictly more
+        amounts = _year_amounts(year)
+        total_donors = len(amounts)
+        rank = total_donors - bisect.bisect_right(amounts, total_amount) + 1
+        percentiles[year] = {
+            "percentile": ((total_donors - rank + 1) / total_donors) * 100,
+            "rank": rank,
+            "total_amount": total_amount,
+            "contribution_count": contrib_count,
+            "total_donors": total_donors
+        }
     
-    conn.close()
     return percentiles
 
+SEARCH_ORDER_CLAUSES = {
+    "date_desc": "c.contribution_date DESC",
+    "date_asc": "c.contribution_date ASC",
+    "amount_desc": "c.amount DESC, c.contribution_date DESC",
+    "amount_asc": "c.amount ASC, c.contribution_date DESC",
+}
+
+@lru_cache(maxsize=256)
+def _build_search_sql(has_first, has_last, zip_clause, has_city, has_state, has_year, exclude_pt, sort_by):
+    """Data SQL for one combination of search filters and sort.
+
+    The same filter shape always yields the identical string, so the SQL is
+    built once and the connection's statement cache can reuse the compiled
+    statement. Bind values follow the order of the clauses below, then LIMIT
+    and OFFSET. zip_clause is the clause from _zip_filter, or "" for no ZIP filter.
+    """
+    where_clauses = []
+    if has_first:
+        where_clauses.append(_ci_equals("first_name"))
+    if has_last:
+        where_clauses.append(_ci_equals("last_name"))
+    if zip_clause:
+        where_clauses.append(zip_clause)
+    if has_city:
+        where_clauses.append(_ci_equals("city"))
+    if has_state:
+        where_clauses.append(_ci_equals("state"))
+    if has_year:
+        where_clauses.append("c.contribution_date >= ? AND c.contribution_date <= ?")
+    # Optionally filter out known passthrough platforms
+    if exclude_pt:
+        where_clauses.append(_conduit_filter())
+
+    where_string = " WHERE " + " AND ".join(where_clauses)
+    # DISTINCT: process_ca.py stores every amendment of a filing as its own row,
+    # so one contribution can appear once per AMEND_ID
+    return f"""
+        SELECT DISTINCT c.first_name, c.last_name, c.contribution_date,
+               c.amount, c.recipient_committee_id,
+               c.city, c.state, c.zip_code
+        FROM contributions c 
+        {where_string}
+        ORDER BY {SEARCH_ORDER_CLAUSES[sort_by]}
+        LIMIT ? OFFSET ?
+    """
+
 @app.route("/", methods=["GET"])
 def search():
     """Main search page for California contributions."""
@@ -192,105 +471,74 @@ def search():
                                    params["state"], year_filter])
 
     results = []
-    total_results = 0
-    total_pages = 0
+    has_more = False
 
     if search_criteria_provided:
         conn = get_db()
         cursor = conn.cursor()
 
-        # Build WHERE clause
-        where_clauses = []
+        # Bind values, in the order _build_search_sql emits the clauses
         query_params = []
 
         if params["first_name"]:
-            where_clauses.append("c.first_name = ? COLLATE NOCASE")
             query_params.append(params["first_name"])
         if params["last_name"]:
-            where_clauses.append("c.last_name = ? COLLATE NOCASE")
             query_params.append(params["last_name"])
+        zip_clause = ""
         if params["zip_code"]:
             # Normalize search ZIP: allow 5 or 9 digit, with/without hyphen/spaces
-            zip_digits = "".join(ch for ch in params["zip_code"] if ch.isdigit())
-            zip5 = zip_digits[:5]
-            # Use materialized normalized ZIP column (zip_norm), falling back is no longer needed on this DB
-            where_clauses.append("(c.zip_norm LIKE ? OR substr(c.zip_norm,1,5) = ?)")
-            query_params.extend([zip_digits + "%", zip5])
+            zip_clause, zip_params = _zip_filter(params["zip_code"])
+            query_params.extend(zip_params)
         if params["city"]:
-            where_clauses.append("c.city = ? COLLATE NOCASE")
             query_params.append(params["city"])
         if params["state"]:
-            where_clauses.append("c.state = ? COLLATE NOCASE")
             query_params.append(params["state"])
         if year_filter:
             start_date = f"{year_filter}-01-01"
             end_date = f"{year_filter}-12-31"
-            where_clauses.append("c.contribution_date >= ? AND c.contribution_date <= ?")
             query_params.extend([start_date, end_date])
-
-        # Optionally filter out known passthrough platforms
         if exclude_passthrough and KNOWN_CA_CONDUITS:
-            conduit_placeholders = ",".join(["?"] * len(KNOWN_CA_CONDUITS))
-            where_clauses.append(f"(fc.committee_name IS NULL OR fc.committee_name NOT IN ({conduit_placeholders}))")
             query_params.extend(KNOWN_CA_CONDUITS)
 
-        if where_clauses:
-            where_string = " WHERE " + " AND ".join(where_clauses)
-
-            # Count query - use subquery with DISTINCT to get accurate count
-            count_query = f"""
-                SELECT COUNT(*) FROM (
-                    SELECT DISTINCT c.first_name, c.last_name, c.contribution_date, c.amount, c.recipient_committee_id, c.city, c.state, c.zip_code
-                    FROM contributions c 
-                    LEFT JOIN filing_committee_mapping fc ON c.recipient_committee_id = fc.filing_id 
-                    {where_string}
-                )
-            """
-            cursor.execute(count_query, query_params)
-            total_results = cursor.fetchone()[0]
-            total_pages = math.ceil(total_results / PAGE_SIZE)
-
-            if total_results > 0:
-                # Data query
-                offset = (page - 1) * PAGE_SIZE
-                if sort_by == "date_asc":
-                    order_clause = "c.contribution_date ASC"
-                elif sort_by == "amount_desc":
-                    order_clause = "c.amount DESC, c.contribution_date DESC"
-                elif sort_by == "amount_asc":
-                    order_clause = "c.amount ASC, c.contribution_date DESC"
-                else:
-                    order_clause = "c.contribution_date DESC"
-                data_query = f"""
-                    SELECT DISTINCT c.first_name, c.last_name, c.contribution_date,
-                           COALESCE(fc.committee_name, 'Committee ID: ' || c.recipient_committee_id) as recipient_display,
-                           c.amount,
-                           COALESCE(fc.committee_type, '') as committee_type, c.recipient_committee_id,
-                           c.city, c.state, c.zip_code
-                    FROM contributions c 
-                    LEFT JOIN filing_committee_mapping fc ON c.recipient_committee_id = fc.filing_id
-                    {where_string}
-                    ORDER BY {order_clause}
-                    LIMIT ? OFFSET ?
-                """
-                cursor.execute(data_query, query_params + [PAGE_SIZE, offset])
-                results = cursor.fetchall()
-
-        conn.close()
+        if query_params:
+            data_query = _build_search_sql(
+                bool(params["first_name"]), bool(params["last_name"]), zip_clause,
+                bool(params["city"]), bool(params["state"]), bool(year_filter),
+                bool(exclude_passthrough and KNOWN_CA_CONDUITS),
+                sort_by if sort_by in SEARCH_ORDER_CLAUSES else "date_desc"
+            )
+
+            # No total count: fetch one extra row to learn whether a next page exists
+            offset = (page - 1) * PAGE_SIZE
+            cursor.execute(data_query, query_params + [PAGE_SIZE + 1, offset])
+            results = cursor.fetchmany(PAGE_SIZE + 1)
+            has_more = len(results) > PAGE_SIZE
+            results = results[:PAGE_SIZE]
 
     # Pagination params (include sort_by)
     pagination_params = {k: v for k, v in params.items() if v}
     if sort_by:
         pagination_params["sort_by"] = sort_by
 
-    return render_template_string(SEARCH_TEMPLATE,
-        results=results, page=page, total_pages=total_pages, total_results=total_results,
+    return render_template("search.html",
+        results=results, page=page, has_more=has_more,
         PAGE_SIZE=PAGE_SIZE, params=params, pagination_params=pagination_params,
         urlencode=urlencode, search_criteria_provided=search_criteria_provided,
         sort_by=sort_by,
         query_params_without_page_sort=urlencode({k:v for k,v in request.args.items() if k not in ['page','sort_by']})
     )
 
+@lru_cache(maxsize=4096)
+def _contributor_totals(where_string, params, ttl_bucket=None):
+    """(count, total amount) of a contributor's filtered contributions, cached per ttl_bucket.
+
+    Kept apart from the page query so each page stays an index seek with LIMIT.
+    """
+    cursor = get_db().cursor()
+    cursor.execute(f"SELECT COUNT(*), SUM(c.amount) FROM contributions c WHERE {where_string}", params)
+    total_count, total_amount = cursor.fetchone()
+    return total_count, total_amount or 0
+
 @app.route("/contributor")
 def contributor_view():
     """Show contributions by a specific contributor."""
@@ -308,6 +556,9 @@ def contributor_view():
     page = request.args.get("page", 1, type=int)
     if page < 1: page = 1
     offset = (page - 1) * PAGE_SIZE
+    # Keyset cursor from the previous page's "Next" link: (contribution_date, rowid) of its last row
+    after_date = request.args.get("after_date", "").strip()
+    after_rowid = request.args.get("after_rowid", type=int)
     
     if not first or not last:
         return "Missing first and last name", 400
@@ -316,84 +567,81 @@ def contributor_view():
     cursor = conn.cursor()
 
     # Build base WHERE clause and params
-    base_where_clauses = ["c.first_name = ? COLLATE NOCASE", "c.last_name = ? COLLATE NOCASE"]
-    query_params = [first, last]
+    base_where_clauses = [_ci_equals("first_name"), _ci_equals("last_name")]
+    query_params = [first.upper(), last.upper()]
 
     # Add address filters if provided
     if city:
-        base_where_clauses.append("c.city = ? COLLATE NOCASE")
-        query_params.append(city)
+        base_where_clauses.append(_ci_equals("city"))
+        query_params.append(city.upper())
     if state:
-        base_where_clauses.append("c.state = ? COLLATE NOCASE")
-        query_params.append(state)
+        base_where_clauses.append(_ci_equals("state"))
+        query_params.append(state.upper())
     if zip_code:
-        zip_digits = "".join(ch for ch in zip_code if ch.isdigit())
-        zip5 = zip_digits[:5]
-        base_where_clauses.append("(c.zip_norm LIKE ? OR substr(c.zip_norm,1,5) = ?)")
-        query_params.extend([zip_digits + "%", zip5])
+        zip_clause, zip_params = _zip_filter(zip_code)
+        base_where_clauses.append(zip_clause)
+        query_params.extend(zip_params)
     
     # Handle passthrough exclusion
-        if exclude_passthrough and KNOWN_CA_CONDUITS:
-        conduit_placeholders = ",".join(["?"] * len(KNOWN_CA_CONDUITS))
-        base_where_clauses.append(f"(fc.committee_name IS NULL OR fc.committee_name NOT IN ({conduit_placeholders}))")
-        final_query_params = query_params + list(KNOWN_CA_CONDUITS)
-    else:
-        final_query_params = query_params
+    if exclude_passthrough and KNOWN_CA_CONDUITS:
+        base_where_clauses.append(_conduit_filter())
+        query_params.extend(KNOWN_CA_CONDUITS)
+    final_query_params = query_params
     
     where_string = " AND ".join(base_where_clauses)
-    from_clause = "FROM contributions c LEFT JOIN filing_committee_mapping fc ON c.recipient_committee_id = fc.filing_id"
 
-    # Count Query
-    count_query_sql = f"SELECT COUNT(*) {from_clause} WHERE {where_string}"
-    
     # Data Query
-        if sort_by == "date_asc":
-            order_clause = "c.contribution_date ASC"
-        elif sort_by == "amount_desc":
-            order_clause = "c.amount DESC, c.contribution_date DESC"
-        elif sort_by == "amount_asc":
-            order_clause = "c.amount ASC, c.contribution_date DESC"
-        else:
-            order_clause = "c.contribution_date DESC"
-        
-    data_query_sql = f"""
-        SELECT c.contribution_date, 
-               COALESCE(fc.committee_name, 'Committee ID: ' || c.recipient_committee_id) as recipient_display,
-               c.amount, c.recipient_committee_id,
-               c.city, c.state, c.zip_code
-        {from_clause}
-        WHERE {where_string}
-        ORDER BY {order_clause} LIMIT ? OFFSET ?
-    """
-    paged_data_params = final_query_params + [PAGE_SIZE, offset]
-
-    # Sum Query
-    sum_query_sql = f"SELECT SUM(c.amount) {from_clause} WHERE {where_string}"
+    if sort_by == "date_asc":
+        order_clause = "c.contribution_date ASC"
+    elif sort_by == "amount_desc":
+        order_clause = "c.amount DESC, c.contribution_date DESC"
+    elif sort_by == "amount_asc":
+        order_clause = "c.amount ASC, c.contribution_date DESC"
+    else:
+        order_clause = "c.contribution_date DESC"
+
+    # Date sorts page on (contribution_date, rowid), so "Next" seeks past the last row instead of using OFFSET
+    date_sort = sort_by not in ("amount_desc", "amount_asc")
+    date_desc = sort_by != "date_asc"
+    keyset = date_sort and page > 1 and bool(after_date) and after_rowid is not None
+    if date_sort:
+        order_clause += ", c.rowid DESC" if date_desc else ", c.rowid ASC"
+    select_sql = f"""
+        SELECT c.contribution_date, c.amount, c.recipient_committee_id,
+               c.city, c.state, c.zip_code, c.rowid AS rowid
+        FROM contributions c
+        WHERE {where_string}"""
+    if keyset and date_desc:
+        # NULL dates sort last in DESC order and never compare below the cursor. They are a
+        # second branch rather than an OR, so SQLite merges two index seeks instead of scanning
+        data_query_sql = f"""
+            {select_sql} AND (c.contribution_date, c.rowid) < (?, ?)
+            UNION ALL
+            {select_sql} AND c.contribution_date IS NULL
+            ORDER BY contribution_date DESC, rowid DESC LIMIT ?
+        """
+        paged_data_params = final_query_params + [after_date, after_rowid] + final_query_params + [PAGE_SIZE]
+    elif keyset:
+        data_query_sql = f"{select_sql} AND (c.contribution_date, c.rowid) > (?, ?) ORDER BY {order_clause} LIMIT ?"
+        paged_data_params = final_query_params + [after_date, after_rowid, PAGE_SIZE]
+    else:
+        data_query_sql = f"{select_sql} ORDER BY {order_clause} LIMIT ? OFFSET ?"
+        paged_data_params = final_query_params + [PAGE_SIZE, offset]
 
     # Execute Queries
-    print(f"\n📋 Executing CA SQL (/contributor count):")
-    print(count_query_sql)
-    print("📎 With params:")
-    pprint.pprint(final_query_params)
-    cursor.execute(count_query_sql, final_query_params)
-    total_results = cursor.fetchone()[0]
+    debug_sql = app.logger.isEnabledFor(logging.DEBUG)
+    if debug_sql:
+        app.logger.debug("📋 CA SQL (/contributor data): %s | params=%r", data_query_sql, paged_data_params)
+    cursor.execute(data_query_sql, paged_data_params)
+    rows = cursor.fetchmany(PAGE_SIZE)
+
+    total_results, total_amount_for_contributor = _contributor_totals(
+        where_string, tuple(final_query_params), _ttl_bucket())
     total_pages = math.ceil(total_results / PAGE_SIZE)
 
-    print(f"\n📋 Executing CA SQL (/contributor data):")
-    print(data_query_sql)
-    print("📎 With params:")
-    pprint.pprint(paged_data_params)
-    cursor.execute(data_query_sql, paged_data_params)
-    rows = cursor.fetchall()
-    
-    print(f"\n📋 Executing CA SQL (/contributor sum):")
-    print(sum_query_sql)
-    print("📎 With params:")
-    pprint.pprint(final_query_params)
-    cursor.execute(sum_query_sql, final_query_params)
-    total_amount_for_contributor = cursor.fetchone()[0] or 0
-
-    conn.close()
+    next_cursor = None
+    if date_sort and rows and rows[-1]["contribution_date"] is not None:
+        next_cursor = urlencode({"after_date": rows[-1]["contribution_date"], "after_rowid": rows[-1]["rowid"]})
     
     # Get percentile data for this donor
     percentiles_by_year = {}
@@ -406,6 +654,7 @@ def contributor_view():
     if state: pagination_params["state"] = state
     if zip_code: pagination_params["zip"] = zip_code
     if exclude_passthrough: pagination_params["exclude_passthrough"] = "1"
+    if sort_by != "date_desc": pagination_params["sort_by"] = sort_by
     base_pagination_url = "/contributor?" + urlencode(pagination_params)
 
     # Construct a filter description string
@@ -417,7 +666,7 @@ def contributor_view():
     if location_parts:
         filter_desc += f" from {', '.join(location_parts)}"
 
-    return render_template_string(CONTRIBUTOR_TEMPLATE,
+    return render_template("contributor.html",
         first=first, last=last, 
         city=city, state=state, zip_code=zip_code,
         filter_desc=filter_desc,
@@ -425,6 +674,7 @@ def contributor_view():
         page=page, total_pages=total_pages, total_results=total_results,
         PAGE_SIZE=PAGE_SIZE,
         base_pagination_url=base_pagination_url,
+        next_cursor=next_cursor,
         percentiles_by_year=percentiles_by_year,
         sort_by=sort_by,
         contributor_query_without_sort=urlencode({k:v for k,v in request.args.items() if k not in ['sort_by']})
@@ -511,22 +761,17 @@ def search_recipients_by_name():
                 """
                 params = like_params + [PAGE_SIZE, offset]
             
+            # Rows already have the template's column layout
             cursor.execute(data_query, params)
-            lookup_results = cursor.fetchall()
-            
-            # Convert to expected format
-            results = []
-            for row in lookup_results:
-                recipient_name, display_name, committee_type, total_contrib, total_amt, recent_contrib, recent_amt, last_date = row
-                results.append((recipient_name, display_name, committee_type, 
-                              total_contrib, total_amt, recent_contrib, recent_amt, last_date))
+            results = cursor.fetchmany(PAGE_SIZE)
 
             # If the lookup/FTS produced zero results, fall back to filing_committee_mapping
             if total_results == 0:
                 # Fallback: use mapping table and compute contribution stats on the fly
                 # Count matched committees
-                count_sql_query = "SELECT COUNT(*) FROM filing_committee_mapping WHERE committee_name LIKE ?"
-                count_params = [f"%{name_query}%"]
+                name_clause, name_param = _committee_name_filter(name_query)
+                count_sql_query = f"SELECT COUNT(*) FROM filing_committee_mapping WHERE {name_clause}"
+                count_params = [name_param]
                 cursor.execute(count_sql_query, count_params)
                 total_results = cursor.fetchone()[0]
                 total_pages = math.ceil(total_results / PAGE_SIZE)
@@ -544,7 +789,7 @@ def search_recipients_by_name():
                     WITH matched AS (
                         SELECT filing_id, committee_name, committee_type
                         FROM filing_committee_mapping
-                        WHERE committee_name LIKE ?
+                        WHERE {name_clause}
                     ),
                     agg AS (
                         SELECT 
@@ -572,46 +817,93 @@ def search_recipients_by_name():
                     ORDER BY {order_clause_mapping}
                     LIMIT ? OFFSET ?
                 """
-                params = [f"%{name_query}%", recent_cutoff, recent_cutoff, PAGE_SIZE, offset]
+                params = [name_param, recent_cutoff, recent_cutoff, PAGE_SIZE, offset]
 
                 cursor.execute(sql_query, params)
-                committee_results = cursor.fetchall()
-
-                # Convert to expected format
-                results = []
-                for filing_id, name, cmte_type, total_contrib, total_amt, recent_contrib, recent_amt, last_date in committee_results:
-                    results.append((filing_id, name, cmte_type, total_contrib, total_amt, recent_contrib, recent_amt, last_date))
+                results = cursor.fetchmany(PAGE_SIZE)
         
         else:
             # Fall back to filing_committee_mapping
-            count_sql_query = "SELECT COUNT(*) FROM filing_committee_mapping WHERE committee_name LIKE ?"
-            count_params = [f"%{name_query}%"]
+            name_clause, name_param = _committee_name_filter(name_query)
+            count_sql_query = f"SELECT COUNT(*) FROM filing_committee_mapping WHERE {name_clause}"
+            count_params = [name_param]
             cursor.execute(count_sql_query, count_params)
             total_results = cursor.fetchone()[0]
             total_pages = math.ceil(total_results / PAGE_SIZE)
 
-            sql_query = "SELECT filing_id, committee_name, committee_type FROM filing_committee_mapping WHERE committee_name LIKE ? ORDER BY committee_name LIMIT ? OFFSET ?"
-            params = [f"%{name_query}%", PAGE_SIZE, offset]
+            # Constant columns pad the rows to the template's layout, with no activity stats
+            sql_query = f"""
+                SELECT filing_id, committee_name, committee_type, 0, 0.0, 0, 0.0, NULL
+                FROM filing_committee_mapping WHERE {name_clause}
+                ORDER BY committee_name LIMIT ? OFFSET ?
+            """
+            params = [name_param, PAGE_SIZE, offset]
 
             cursor.execute(sql_query, params)
-            committee_results = cursor.fetchall()
-            
-            # Convert to expected format
-            results = []
-            for filing_id, name, cmte_type in committee_results:
-                results.append((filing_id, name, cmte_type, 0, 0.0, 0, 0.0, None))
-        
-        conn.close()
+            results = cursor.fetchmany(PAGE_SIZE)
 
-    return render_template_string(SEARCH_RECIPIENTS_TEMPLATE,
+    return render_template("search_recipients.html",
        results=results, name_query=name_query, sort_by=sort_by, page=page, 
        total_pages=total_pages, total_results=total_results, PAGE_SIZE=PAGE_SIZE,
        urlencode=urlencode, query_params_without_page=urlencode({k:v for k,v in request.args.items() if k not in ['page']}))
 
+@lru_cache(maxsize=1)
+def _person_search_page():
+    """The person search form has no per-request content, so it is rendered once."""
+    return render_template("person_search.html")
+
 @app.route("/personsearch", methods=["GET"])
 def person_search_form():
     """Person search form."""
-    return render_template_string(PERSON_SEARCH_TEMPLATE)
+    return _person_search_page()
+
+@lru_cache(maxsize=64)
+def _person_recent_sql(has_city, zip_clause, level=0):
+    """Recent-contributions SQL for one person-search cascade attempt.
+
+    Bind values: first name, last name, city (if has_city), state, the
+    zip_clause values, the conduit names, then LIMIT. A level above 0 adds
+    guards on the earlier attempts' CTEs lvl0..lvl{level-1} (see
+    _person_cascade_sql), so the scan is skipped once one of them matched.
+    """
+    # Constant guards come first; SQLite checks them once, before the scan
+    where_clauses = [f"NOT EXISTS (SELECT 1 FROM lvl{i})" for i in range(level)]
+    where_clauses += [_ci_equals("first_name"), _ci_equals("last_name")]
+    if has_city:
+        where_clauses.append(_ci_equals("city"))
+    where_clauses.append(_ci_equals("state"))
+    if zip_clause:
+        where_clauses.append(zip_clause)
+    # Optionally exclude known passthrough platforms
+    if KNOWN_CA_CONDUITS:
+        where_clauses.append(_conduit_filter())
+    return f"""
+        SELECT c.contribution_date, c.amount, c.recipient_committee_id, c.city, c.state, c.zip_code,
+               SUM(c.amount) OVER () AS grand_total
+        FROM contributions c
+        WHERE {" AND ".join(where_clauses)}
+        ORDER BY c.contribution_date DESC
+        LIMIT ?
+    """
+
+@lru_cache(maxsize=64)
+def _person_cascade_sql(attempt_shapes):
+    """One statement running every cascade attempt and returning only the first that matches.
+
+    attempt_shapes holds the (has_city, zip_clause) of each attempt in order.
+    Each row carries the matching attempt's index as cascade_level. Bind
+    values are each attempt's _person_recent_sql values, in attempt order.
+    """
+    ctes = ",\n".join(f"lvl{i} AS ({_person_recent_sql(*shape, i)})" for i, shape in enumerate(attempt_shapes))
+    selects = "\nUNION ALL\n".join(f"SELECT {i} AS cascade_level, * FROM lvl{i}" for i in range(len(attempt_shapes)))
+    return f"WITH {ctes}\n{selects}"
+
+def _gsearch(*parts, require_all=()):
+    """(query, Google search URL) for the non-empty parts; (None, None) unless every require_all value is set."""
+    if not all(require_all):
+        return None, None
+    query = " ".join(part for part in parts if part)
+    return query, f"https://www.google.com/search?igu=1&q={_qp(query)}" if query else None
 
 @app.route("/person")
 def person_view_results():
@@ -667,84 +959,48 @@ def person_view_results():
 
     found_db_results = False
     effective_db_params = {}
-    last_attempt_db_params = {}
+    last_attempt_db_params = db_search_attempts[-1]["params"]
 
+    # Query shape and bind values for every attempt, run together below
+    attempt_shapes = []
+    cascade_params = []
     for attempt in db_search_attempts:
         current_db_params = attempt["params"]
-        level = attempt["level"]
-        last_attempt_db_params = current_db_params
-
-        db_where_clauses = ["c.first_name = ? COLLATE NOCASE", "c.last_name = ? COLLATE NOCASE"]
         db_query_actual_params = [current_db_params["first_name"], current_db_params["last_name"]]
-        state_filter_applied = None
 
         if current_db_params["city"]:
-            db_where_clauses.append("c.city = ? COLLATE NOCASE")
             db_query_actual_params.append(current_db_params["city"])
-            
         # State handling: Apply explicit state OR default to CA
-        if current_db_params["state"]:
-            db_where_clauses.append("c.state = ? COLLATE NOCASE")
-            db_query_actual_params.append(current_db_params["state"])
-            state_filter_applied = current_db_params["state"]
-        else:
-            db_where_clauses.append("c.state = ? COLLATE NOCASE")
-            db_query_actual_params.append("CA")
-            state_filter_applied = "CA (Default)"
-            
+        db_query_actual_params.append(current_db_params["state"] or "CA")
+
+        zip_clause = ""
         if current_db_params["zip_code"]:
-            zip_digits = "".join(ch for ch in current_db_params["zip_code"] if ch.isdigit())
-            zip5 = zip_digits[:5]
-            db_where_clauses.append("(c.zip_norm LIKE ? OR substr(c.zip_norm,1,5) = ?)")
-            db_query_actual_params.extend([zip_digits + "%", zip5])
+            zip_clause, zip_params = _zip_filter(current_db_params["zip_code"])
+            db_query_actual_params.extend(zip_params)
 
         # Optionally exclude known passthrough platforms
         if KNOWN_CA_CONDUITS:
-            conduit_placeholders = ",".join(["?"] * len(KNOWN_CA_CONDUITS))
-            db_where_clauses.append(f"(fc.committee_name IS NULL OR fc.committee_name NOT IN ({conduit_placeholders}))")
             db_query_actual_params.extend(KNOWN_CA_CONDUITS)
 
-        db_where_string = " AND ".join(db_where_clauses)
+        attempt_shapes.append((bool(current_db_params["city"]), zip_clause))
+        cascade_params.extend(db_query_actual_params)
+        cascade_params.append(PERSON_SEARCH_PAGE_SIZE)
 
-        # Check if any contributions exist with these criteria
-        check_existence_sql = f"""SELECT 1 FROM contributions c 
-                                LEFT JOIN filing_committee_mapping fc ON c.recipient_committee_id = fc.filing_id 
-                                WHERE {db_where_string} LIMIT 1"""
-        
-        cursor.execute(check_existence_sql, db_query_actual_params)
-        if cursor.fetchone():
-            found_db_results = True
-            effective_db_params = current_db_params
-            if level == "Dropped ZIP Code from DB query":
-                db_cascade_message = "(Contribution data found after dropping ZIP code filter from DB query)"
-            elif level == "Dropped City & ZIP Code from DB query":
-                db_cascade_message = "(Contribution data found after dropping City & ZIP code filters from DB query)"
-            else:
-                db_cascade_message = ""
-
-            # Query for total contribution amount
-            sum_query = f"""SELECT SUM(c.amount) FROM contributions c 
-                           LEFT JOIN filing_committee_mapping fc ON c.recipient_committee_id = fc.filing_id 
-                           WHERE {db_where_string}"""
-            cursor.execute(sum_query, db_query_actual_params)
-            total_amount_result = cursor.fetchone()
-            total_amount = total_amount_result[0] if total_amount_result and total_amount_result[0] is not None else 0.0
-
-            # Query for recent contributions
-            recent_query = f"""
-                SELECT c.contribution_date, 
-                       COALESCE(fc.committee_name, 'Committee ID: ' || c.recipient_committee_id) as recipient_display_name,
-                       c.amount, c.recipient_committee_id, c.city, c.state, c.zip_code
-                FROM contributions c
-                LEFT JOIN filing_committee_mapping fc ON c.recipient_committee_id = fc.filing_id
-                WHERE {db_where_string}
-                ORDER BY c.contribution_date DESC
-                LIMIT ?
-            """
-            recent_query_final_params = db_query_actual_params + [PERSON_SEARCH_PAGE_SIZE]
-            cursor.execute(recent_query, recent_query_final_params)
-            recent_contributions = cursor.fetchall()
-            break
+    # Recent contributions from the first attempt that matches, with its grand total riding along
+    cursor.execute(_person_cascade_sql(tuple(attempt_shapes)), cascade_params)
+    recent_contributions = cursor.fetchmany(PERSON_SEARCH_PAGE_SIZE)
+    if recent_contributions:
+        attempt = db_search_attempts[recent_contributions[0]["cascade_level"]]
+        level = attempt["level"]
+        found_db_results = True
+        effective_db_params = attempt["params"]
+        if level == "Dropped ZIP Code from DB query":
+            db_cascade_message = "(Contribution data found after dropping ZIP code filter from DB query)"
+        elif level == "Dropped City & ZIP Code from DB query":
+            db_cascade_message = "(Contribution data found after dropping City & ZIP code filters from DB query)"
+        else:
+            db_cascade_message = ""
+        total_amount = recent_contributions[0]["grand_total"] or 0.0
     
     no_results_message = None
     if not found_db_results:
@@ -776,51 +1032,29 @@ def person_view_results():
             no_results_message += " Also tried searching database without City & ZIP."
         no_results_message += " (Excluding passthroughs)."
 
-    conn.close()
-
     # Prepare Google search URLs (uses original_form_params)
-    
+    first_name, last_name = original_form_params["first_name"], original_form_params["last_name"]
+    city = original_form_params["city"]
+    email = original_form_params["email"]
+
     # Address Search
-    google_search_query_address_parts = []
-    if original_form_params["first_name"]: google_search_query_address_parts.append(original_form_params["first_name"])
-    if original_form_params["last_name"]: google_search_query_address_parts.append(original_form_params["last_name"])
-    if original_form_params["street"]: google_search_query_address_parts.append(original_form_params["street"])
-    if original_form_params["city"]: google_search_query_address_parts.append(original_form_params["city"])
-    if original_form_params["state"]: google_search_query_address_parts.append(original_form_params["state"])
-    google_search_query_address = " ".join(filter(None, google_search_query_address_parts))
-    google_search_url_address = f"https://www.google.com/search?igu=1&q={quote_plus(google_search_query_address)}" if google_search_query_address else None
+    google_search_query_address, google_search_url_address = _gsearch(
+        first_name, last_name, original_form_params["street"], city, original_form_params["state"])
 
     # Phone Search (using normalized number)
     formatted_phone = normalize_and_format_phone(original_form_params["phone"])
-    google_search_query_phone = None
-    google_search_url_phone = None
-    if formatted_phone:
-        google_search_query_phone_parts = []
-        if original_form_params["first_name"]: google_search_query_phone_parts.append(original_form_params["first_name"])
-        if original_form_params["last_name"]: google_search_query_phone_parts.append(original_form_params["last_name"])
-        google_search_query_phone_parts.append(formatted_phone)
-        google_search_query_phone = " ".join(filter(None, google_search_query_phone_parts))
-        google_search_url_phone = f"https://www.google.com/search?igu=1&q={quote_plus(google_search_query_phone)}"
-        
+    google_search_query_phone, google_search_url_phone = _gsearch(
+        first_name, last_name, formatted_phone, require_all=(formatted_phone,))
+
     # Email Search
-    google_search_query_email_parts = []
-    if original_form_params["first_name"]: google_search_query_email_parts.append(original_form_params["first_name"])
-    if original_form_params["last_name"]: google_search_query_email_parts.append(original_form_params["last_name"])
-    if original_form_params["email"]: google_search_query_email_parts.append(original_form_params["email"])
-    google_search_query_email = " ".join(filter(None, google_search_query_email_parts))
-    google_search_url_email = f"https://www.google.com/search?igu=1&q={quote_plus(google_search_query_email)}" if original_form_params["email"] else None
+    google_search_query_email, google_search_url_email = _gsearch(
+        first_name, last_name, email, require_all=(email,))
 
     # Name + City Search
-    google_search_query_name_city_parts = []
-    if original_form_params["first_name"]: google_search_query_name_city_parts.append(original_form_params["first_name"])
-    if original_form_params["last_name"]: google_search_query_name_city_parts.append(original_form_params["last_name"])
-    if original_form_params["city"]: google_search_query_name_city_parts.append(original_form_params["city"])
-    google_search_query_name_city = " ".join(filter(None, google_search_query_name_city_parts))
-    google_search_url_name_city = None
-    if original_form_params["first_name"] and original_form_params["last_name"] and original_form_params["city"]:
-        google_search_url_name_city = f"https://www.google.com/search?igu=1&q={quote_plus(google_search_query_name_city)}"
+    google_search_query_name_city, google_search_url_name_city = _gsearch(
+        first_name, last_name, city, require_all=(first_name, last_name, city))
     
-    return render_template_string(PERSON_RESULTS_TEMPLATE, 
+    return render_template("person_results.html", 
                                 original_form_params=original_form_params,
                                 total_amount=total_amount, 
                                 recent_contributions=recent_contributions,
@@ -836,7 +1070,154 @@ def person_view_results():
                                 google_search_query_name_city=google_search_query_name_city
                                 )
 
+# Cached counts and totals are keyed on a time bucket as well, so after a data
+# load they refresh within COUNT_CACHE_TTL seconds without restarting the app
+COUNT_CACHE_TTL = 60
+
+def _ttl_bucket():
+    return int(time.monotonic() // COUNT_CACHE_TTL)
+
+@lru_cache(maxsize=1024)
+def _recipient_donor_count(committee_id, ttl_bucket=None):
+    """Number of distinct (first, last) donors to a committee, cached per ttl_bucket.
+
+    DISTINCT over idx_ca_recipient_name is read straight off the index, with no temp B-tree.
+    """
+    cursor = get_db().cursor()
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM (
+            SELECT DISTINCT first_name, last_name
+            FROM contributions
+            WHERE recipient_committee_id = ?
+        )
+    """, (committee_id,))
+    return cursor.fetchone()[0]
+
+def _evict_stale(cache, now, limit):
+    """Drop entries from the front of a TTL dict until the oldest is fresh and there is room for one more.
+
+    Entries are inserted in time order with one TTL, so the front entry always expires first.
+    """
+    while cache:
+        oldest = next(iter(cache))
+        if cache[oldest][0] > now and len(cache) < limit:
+            break
+        del cache[oldest]
+
+# Rendered /recipient and /committee pages, keyed by path, query string and database generation.
+# (path, query, generation) -> (expiry, html). Bounded by the memory the pages take, since a
+# committee page can hold 1,000 rows; the TTL matches the cached counts shown on the pages.
+PAGE_CACHE_TTL = COUNT_CACHE_TTL
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_page_cache = {}
+_page_cache_bytes = 0
+_page_cache_lock = threading.Lock()
+
+def _store_page(key, now, html):
+    """Add a rendered page, first dropping expired and then oldest pages until it fits."""
+    global _page_cache_bytes
+    size = sys.getsizeof(html)
+    if size > PAGE_CACHE_MAX_BYTES:
+        return
+    with _page_cache_lock:
+        replaced = _page_cache.pop(key, None)
+        if replaced:
+            _page_cache_bytes -= sys.getsizeof(replaced[1])
+        # Entries are inserted in time order with one TTL, so the front one expires first
+        while _page_cache:
+            oldest = next(iter(_page_cache))
+            expiry, old_html = _page_cache[oldest]
+            if expiry > now and _page_cache_bytes + size <= PAGE_CACHE_MAX_BYTES:
+                break
+            del _page_cache[oldest]
+            _page_cache_bytes -= sys.getsizeof(old_html)
+        _page_cache[key] = (now + PAGE_CACHE_TTL, html)
+        _page_cache_bytes += size
+
+def cached_page(view):
+    """Serve a view's HTML from _page_cache for PAGE_CACHE_TTL seconds; error responses aren't cached."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        page = (request.path, request.query_string)
+        key = page + (current_db_generation(),)
+        now = time.monotonic()
+        with _page_cache_lock:
+            entry = _page_cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+        html = view(*args, **kwargs)
+        if isinstance(html, str):
+            # Stored under the generation of the connection that rendered it, so a page read
+            # from the old file never lands under the new file's key
+            _store_page(page + (getattr(_local, "generation", None),), now, html)
+        return html
+    return wrapper
+
+# Top-contributor page; the window counts every donor group alongside the page
+RECIPIENT_PAGE_SQL = """
+        SELECT first_name, last_name, SUM(amount) as total, COUNT(*) OVER () AS total_groups
+        FROM contributions
+        WHERE recipient_committee_id = ?
+        GROUP BY first_name, last_name
+        ORDER BY total DESC
+        LIMIT ? OFFSET ?
+    """
+
+# The page after the one being served is fetched in the background, so "Next »" is a dict lookup.
+# (committee_id, page) -> (expiry, db generation, rows); entries are dropped when read or once expired.
+RECIPIENT_PREFETCH_TTL = 60
+RECIPIENT_PREFETCH_MAX = 256
+_recipient_prefetched = {}
+_recipient_prefetch_lock = threading.Lock()
+_recipient_prefetch_queue = queue.Queue(maxsize=64)
+_recipient_prefetch_worker = None
+
+def _recipient_page_rows(committee_id, page):
+    """One /recipient page: (first_name, last_name, total, total_groups) rows."""
+    cursor = get_db().cursor()
+    cursor.execute(RECIPIENT_PAGE_SQL, (committee_id, PAGE_SIZE, (page - 1) * PAGE_SIZE))
+    return cursor.fetchmany(PAGE_SIZE)
+
+def _take_prefetched_recipient_page(committee_id, page):
+    """Rows prefetched for this page if still fresh and read from the current database file, else None."""
+    with _recipient_prefetch_lock:
+        entry = _recipient_prefetched.pop((committee_id, page), None)
+    if entry and entry[0] > time.monotonic() and entry[1] == current_db_generation():
+        return entry[2]
+    return None
+
+def _recipient_prefetch_loop():
+    """Background worker; keeps one connection (via get_db) for all prefetches."""
+    while True:
+        committee_id, page = _recipient_prefetch_queue.get()
+        try:
+            rows = _recipient_page_rows(committee_id, page)
+        except sqlite3.Error as e:
+            app.logger.debug("Prefetch of /recipient %s page %s failed: %s", committee_id, page, e)
+            continue
+        now = time.monotonic()
+        with _recipient_prefetch_lock:
+            _evict_stale(_recipient_prefetched, now, RECIPIENT_PREFETCH_MAX)
+            # get_db() above recorded which file generation the rows came from
+            _recipient_prefetched[(committee_id, page)] = (now + RECIPIENT_PREFETCH_TTL, _local.generation, rows)
+
+def _prefetch_recipient_page(committee_id, page):
+    """Queue a page for the background worker, starting it on first use; skipped when busy."""
+    global _recipient_prefetch_worker
+    with _recipient_prefetch_lock:
+        if (committee_id, page) in _recipient_prefetched:
+            return
+        if _recipient_prefetch_worker is None:
+            _recipient_prefetch_worker = threading.Thread(target=_recipient_prefetch_loop, daemon=True)
+            _recipient_prefetch_worker.start()
+    try:
+        _recipient_prefetch_queue.put_nowait((committee_id, page))
+    except queue.Full:
+        pass
+
 @app.route("/recipient")
+@cached_page
 def recipient_view():
     """Show top contributors to a specific recipient."""
     committee_id = request.args.get("committee_id", "").strip()
@@ -847,61 +1228,70 @@ def recipient_view():
     if not committee_id:
         return "Missing committee_id", 400
 
-    conn = get_db()
-    cursor = conn.cursor()
+    get_db()  # loads FC_MAP on first use
 
     # Get committee name
-    cursor.execute("SELECT committee_name FROM filing_committee_mapping WHERE filing_id = ?", (committee_id,))
-    name_row = cursor.fetchone()
-    recipient_name = name_row[0] if name_row else committee_id
-
-    # Query for paged results
-    data_query_str = """
-        SELECT first_name, last_name, SUM(amount) as total
-        FROM contributions
-        WHERE recipient_committee_id = ?
-        GROUP BY first_name, last_name
-        ORDER BY total DESC
-        LIMIT ? OFFSET ?
-    """
-    data_params = [committee_id, PAGE_SIZE, offset]
+    committee_info = FC_MAP.get(committee_id)
+    recipient_name = committee_info[0] if committee_info else committee_id
 
-    # Count query for total groups of contributors
-    count_query_str = """
-        SELECT COUNT(*)
-        FROM (
-            SELECT 1
-            FROM contributions
-            WHERE recipient_committee_id = ?
-            GROUP BY first_name, last_name
-        )
-    """
-    count_params = [committee_id]
+    # Query for paged results, unless the previous page already fetched this one
+    rows = _take_prefetched_recipient_page(committee_id, page)
+    if rows is None:
+        app.logger.debug("📋 CA SQL (/recipient data): %s | params=%r", RECIPIENT_PAGE_SQL, [committee_id, PAGE_SIZE, offset])
+        rows = _recipient_page_rows(committee_id, page)
 
-    print(f"\n📋 Executing CA SQL (/recipient count):")
-    print(count_query_str)
-    print("📎 With params:")
-    pprint.pprint(count_params)
-    
-    cursor.execute(count_query_str, count_params)
-    total_results = cursor.fetchone()[0]
+    # A page past the end has no row to carry the window count
+    total_results = rows[0]["total_groups"] if rows else _recipient_donor_count(committee_id, _ttl_bucket())
     total_pages = math.ceil(total_results / PAGE_SIZE)
+    rows = [(first, last, format_currency(total)) for first, last, total, _ in rows]
+    if page < total_pages:
+        _prefetch_recipient_page(committee_id, page + 1)
 
-    print(f"\n📋 Executing CA SQL (/recipient data):")
-    print(data_query_str)
-    print("📎 With params:")
-    pprint.pprint(data_params)
-
-    cursor.execute(data_query_str, data_params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return render_template_string(RECIPIENT_TEMPLATE, 
+    return render_template("recipient.html", 
         recipient_name=recipient_name, rows=rows, committee_id=committee_id, 
         page=page, total_pages=total_pages, total_results=total_results, PAGE_SIZE=PAGE_SIZE,
         query_params_without_page=urlencode({k:v for k,v in request.args.items() if k not in ['page', 'committee_id']}))
 
+@lru_cache(maxsize=4096)
+def _committee_totals(committee_id, ttl_bucket=None):
+    """(count, total amount) of all contributions to a committee, cached per ttl_bucket.
+
+    Counts the same distinct rows the committee page lists, so an amended
+    filing's repeated rows are counted once.
+    """
+    cursor = get_db().cursor()
+    cursor.execute("""
+        SELECT COUNT(*), SUM(amount) FROM (
+            SELECT DISTINCT c.contribution_date, c.first_name, c.last_name, c.city, c.state,
+                   c.amount, c.employer, c.occupation
+            FROM contributions c
+            WHERE c.recipient_committee_id = ?
+        )
+    """, (committee_id,))
+    total_count, total_amount = cursor.fetchone()
+    return total_count, total_amount or 0
+
+# One fixed statement per committee page sort, so each is prepared once per connection.
+# DISTINCT collapses the rows process_ca.py stores once per AMEND_ID of a filing.
+COMMITTEE_SQL = {
+    sort_by: f"""
+        SELECT DISTINCT c.contribution_date, c.first_name, c.last_name, c.city, c.state, 
+               c.amount, c.employer, c.occupation
+        FROM contributions c
+        WHERE c.recipient_committee_id = ?
+        ORDER BY {order_clause}
+        LIMIT 1000
+    """
+    for sort_by, order_clause in {
+        "date_desc": "c.contribution_date DESC, c.amount DESC",
+        "date_asc": "c.contribution_date ASC, c.amount DESC",
+        "amount_desc": "c.amount DESC, c.contribution_date DESC",
+        "amount_asc": "c.amount ASC, c.contribution_date DESC",
+    }.items()
+}
+
 @app.route("/committee/<committee_id>")
+@cached_page
 def committee_view(committee_id):
     """Show all contributions to a specific committee."""
     sort_by = request.args.get("sort_by", "date_desc").strip()
@@ -910,713 +1300,30 @@ def committee_view(committee_id):
     cursor = conn.cursor()
     
     # Get committee information
-    cursor.execute("""
-        SELECT committee_name, committee_type 
-        FROM filing_committee_mapping 
-        WHERE filing_id = ?
-    """, (committee_id,))
-    committee_info = cursor.fetchone()
+    committee_info = FC_MAP.get(committee_id)
     
     if not committee_info:
         return f"Committee {committee_id} not found", 404
     
     committee_name, committee_type = committee_info
     
-    # Build order clause
-    if sort_by == "date_asc":
-        order_clause = "c.contribution_date ASC, c.amount DESC"
-    elif sort_by == "amount_desc":
-        order_clause = "c.amount DESC, c.contribution_date DESC"
-    elif sort_by == "amount_asc":
-        order_clause = "c.amount ASC, c.contribution_date DESC"
-    else:
-        order_clause = "c.contribution_date DESC, c.amount DESC"
-    
-    # Get all contributions to this committee
-    cursor.execute(f"""
-        SELECT DISTINCT c.contribution_date, c.first_name, c.last_name, c.city, c.state, 
-               c.amount, c.employer, c.occupation
-        FROM contributions c
-        WHERE c.recipient_committee_id = ?
-        ORDER BY {order_clause}
-        LIMIT 1000
-    """, (committee_id,))
-    contributions = cursor.fetchall()
+    # Get the most recent (or largest) 1,000 contributions to this committee
+    cursor.execute(COMMITTEE_SQL.get(sort_by, COMMITTEE_SQL["date_desc"]), (committee_id,))
+    # Rows stream from the cursor into the template loop; amounts are formatted once here
+    # rather than through a filter call per rendered row
+    contributions = ((date, first, last, city, state, format_currency(amount), employer, occupation)
+                     for date, first, last, city, state, amount, employer, occupation in cursor)
     
     # Get total amount and count
-    cursor.execute("""
-        SELECT COUNT(*), SUM(c.amount)
-        FROM contributions c
-        WHERE c.recipient_committee_id = ?
-    """, (committee_id,))
-    total_count, total_amount = cursor.fetchone()
-    total_amount = total_amount or 0
+    total_count, total_amount = _committee_totals(committee_id, _ttl_bucket())
     
-    conn.close()
-    
-    return render_template_string(COMMITTEE_TEMPLATE,
+    return render_template("committee.html",
         committee_id=committee_id, committee_name=committee_name, committee_type=committee_type,
-        contributions=contributions, total_count=total_count, total_amount=total_amount,
+        contributions=contributions, total_count=total_count, total_amount=format_currency(total_amount),
         sort_by=sort_by,
         committee_query_without_sort=urlencode({k:v for k,v in request.args.items() if k not in ['sort_by']})
     )
 
-# HTML Templates
-SEARCH_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>CA Campaign Contribution Search</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 20px; background-color: #f4f7f6; color: #333; }
-        h1, h2 { color: #2c3e50; margin-bottom: 20px; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        .nav-links { margin-bottom: 20px; }
-        .nav-links a { margin-right: 15px; font-size: 1.1em; display: inline-block; }
-        form { background-color: #fff; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 30px; display: flex; flex-wrap: wrap; gap: 15px; align-items: center; }
-        form input[type="text"], form input[type="date"], form select { padding: 10px; border: 1px solid #ddd; border-radius: 4px; font-size: 1em; flex-grow: 1; min-width: 120px; }
-        form input[type="submit"], button { background-color: #e67e22; color: white; padding: 10px 15px; border: none; border-radius: 4px; cursor: pointer; font-size: 1em; }
-        form input[type="submit"]:hover, button:hover { background-color: #d35400; }
-        table { width: 100%; border-collapse: collapse; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); border-radius: 8px; margin-top: 20px; }
-        th, td { padding: 12px 15px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #fff3e0; color: #333; font-weight: 600; }
-        tr:nth-child(even) { background-color: #f9f9f9; }
-        tr:hover { background-color: #f1f1f1; }
-        .pagination { text-align: center; margin: 20px 0; }
-        .pagination a, .pagination span { display: inline-block; padding: 8px 12px; margin: 0 4px; border: 1px solid #ddd; border-radius: 4px; }
-        .pagination a:hover { background: #f0f0f0; }
-        .info-link { text-decoration: none; margin-left: 5px; font-size: 0.9em; color: #7f8c8d; }
-        .info-link:hover { color: #3498db; }
-    </style>
-</head>
-<body>
-    <h1>🏛️ CA Campaign Contribution Search</h1>
-    <div class="nav-links">
-        <a href="/">💰 Contribution Search</a>
-        <a href="/search_recipients">🏢 Recipient Search</a>
-        <a href="/personsearch">👤 Person Search</a>
-        <a href="{{ build_fec_app_url('/', params) }}" style="color: #3498db;" target="_blank">🇺🇸 Search Federal Data</a>
-    </div>
-    <h2>Search Contributions</h2>
-        
-        <form method="get">
-            <input name="first_name" placeholder="First Name" value="{{ params.first_name }}">
-            <input name="last_name" placeholder="Last Name" value="{{ params.last_name }}">
-            <input name="city" placeholder="City" value="{{ params.city }}">
-            <input name="state" placeholder="State" value="{{ params.state }}" maxlength="2">
-            <input name="zip_code" placeholder="ZIP Code" value="{{ params.zip_code }}">
-            <input name="year" placeholder="Year (YYYY)" value="{{ params.year }}">
-            <select name="sort_by">
-                <option value="date_desc" {% if sort_by == 'date_desc' %}selected{% endif %}>Date (newest)</option>
-                <option value="date_asc" {% if sort_by == 'date_asc' %}selected{% endif %}>Date (oldest)</option>
-                <option value="amount_desc" {% if sort_by == 'amount_desc' %}selected{% endif %}>Amount (highest)</option>
-                <option value="amount_asc" {% if sort_by == 'amount_asc' %}selected{% endif %}>Amount (lowest)</option>
-            </select>
-            <label style="margin-left:10px; display:flex; align-items:center; gap:6px;">
-                <input type="checkbox" name="exclude_passthrough" value="1" {% if params.exclude_passthrough %}checked{% endif %}>
-                Exclude passthroughs (ActBlue/WinRed)
-            </label>
-            <input type="submit" value="Search">
-        </form>
-
-        {% if results %}
-            <h2>Results ({{ total_results|comma }} found)</h2>
-            <table>
-                <tr>
-                    <th><a href="/?{{ query_params_without_page_sort }}&sort_by={{ 'date_desc' if sort_by != 'date_desc' else 'date_asc' }}">First</a></th>
-                    <th><a href="/?{{ query_params_without_page_sort }}&sort_by={{ 'date_desc' if sort_by != 'date_desc' else 'date_asc' }}">Last</a></th>
-                    <th><a href="/?{{ query_params_without_page_sort }}&sort_by={{ 'date_desc' if sort_by != 'date_desc' else 'date_asc' }}">Date</a></th>
-                    <th>Recipient</th>
-                    <th><a href="/?{{ query_params_without_page_sort }}&sort_by={{ 'amount_desc' if sort_by != 'amount_desc' else 'amount_asc' }}">Amount</a></th>
-                    <th>City</th><th>State</th><th>ZIP</th>
-                </tr>
-                {% for fn, ln, date, recip, amt, typ, cmte_id, city, state, zip in results %}
-                <tr>
-                    <td><a href="/contributor?first={{ fn }}&last={{ ln }}&city={{ city|urlencode }}&state={{ state|urlencode }}&zip={{ zip|urlencode }}">{{ fn }}</a></td>
-                    <td><a href="/contributor?first={{ fn }}&last={{ ln }}&city={{ city|urlencode }}&state={{ state|urlencode }}&zip={{ zip|urlencode }}">{{ ln }}</a></td>
-                    <td>{{ date }}</td>
-                    <td>
-                        <a href="/recipient?committee_id={{ cmte_id }}">{{ recip }}</a>
-                        <a href="https://www.google.com/search?q={{ recip|quote_plus }}" class="info-link" target="_blank" title="Search Google for {{ recip }}">&#x24D8;</a>
-                    </td>
-                    <td>{{ amt|currency }}</td>
-                    <td>{{ city }}</td>
-                    <td>{{ state }}</td>
-                    <td>{{ zip }}</td>
-                </tr>
-                {% endfor %}
-            </table>
-            
-            {% if total_pages > 1 %}
-            <div class="pagination">
-                {% set base_url = "/?" + urlencode(pagination_params) %}
-                {% if page > 1 %}
-                    <a href="{{ base_url }}&page={{ page - 1 }}">&laquo; Previous</a>
-                {% endif %}
-                <span>Page {{ page }} of {{ total_pages }}</span>
-                {% if page < total_pages %}
-                    <a href="{{ base_url }}&page={{ page + 1 }}">Next &raquo;</a>
-                {% endif %}
-            </div>
-            {% endif %}
-        {% elif search_criteria_provided %}
-            <p>No results found. Try broadening your search criteria.</p>
-        {% endif %}
-    </div>
-</body>
-</html>
-"""
-
-CONTRIBUTOR_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>CA Contributions by {{ filter_desc }}</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 20px; background-color: #f4f7f6; color: #333; }
-        h1, h2 { color: #2c3e50; margin-bottom: 10px; }
-        h1 { font-size: 1.8em; }
-        h2 { font-size: 1.2em; margin-top: 20px; }
-        .filter-info { font-size: 0.95em; color: #555; margin-bottom: 20px; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        .nav-links { margin-bottom: 20px; }
-        .nav-links a { margin-right: 15px; font-size: 1.1em; display: inline-block; }
-        table { width: 100%; border-collapse: collapse; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); border-radius: 8px; margin-top: 20px; }
-        th, td { padding: 12px 15px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #eaf2f8; color: #333; font-weight: 600; }
-        tr:nth-child(even) { background-color: #f9f9f9; }
-        tr:hover { background-color: #f1f1f1; }
-        .pagination { margin: 25px 0; text-align: center; clear: both; }
-        .pagination a, .pagination span { display: inline-block; padding: 8px 14px; margin: 0 4px; border: 1px solid #ddd; border-radius: 4px; color: #3498db; text-decoration: none; font-size: 0.95em; }
-        .pagination a:hover { background-color: #eaf2f8; border-color: #c5ddec; }
-        .pagination .current-page { background-color: #3498db; color: white; border-color: #3498db; font-weight: bold; }
-        .results-summary { margin: 20px 0 10px 0; font-size: 0.9em; color: #555; }
-        .info-link { text-decoration: none; margin-left: 5px; font-size: 0.9em; color: #7f8c8d; }
-        .info-link:hover { color: #3498db; }
-    </style>
-</head>
-<body>
-    <h1>CA Contributions by {{ first }} {{ last }}</h1>
-    <div class="filter-info">Showing contributions matching: {{ filter_desc }}</div>
-    <div class="nav-links">
-        <a href="/">🔍 New Search</a>
-        <a href="/search_recipients">👥 Search Recipients by Name</a>
-        <a href="/personsearch">👤 Person Search</a>
-        <a href="{{ build_fec_app_url('/contributor', {'first_name': first, 'last_name': last, 'city': city, 'state': state, 'zip_code': zip_code}) }}" style="color: #3498db;" target="_blank">🇺🇸 Search Federal Data</a>
-    </div>
-    <h2>Total Contributed (matching filter, all pages): {{ total_amount_for_contributor|currency }}</h2>
-    
-    {% if percentiles_by_year and zip_code %}
-    <div style="background-color: #fff; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin: 20px 0;">
-        <h3 style="margin-top: 0; color: #2c3e50;">📊 CA Donor Percentile Rankings</h3>
-        <p style="font-size: 0.9em; color: #666; margin-bottom: 15px;">
-            Based on total annual contributions among all CA donors identified as: {{ first }} {{ last }} ({{ zip_code[:5] }})
-        </p>
-        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 10px;">
-            {% for year in percentiles_by_year.keys()|sort(reverse=True) %}
-            {% set data = percentiles_by_year[year] %}
-            <div style="background-color: #f8f9fa; padding: 10px; border-radius: 4px; border-left: 4px solid #3498db;">
-                <strong>{{ year }}</strong><br>
-                <span style="font-size: 1.1em; color: #2c3e50;">{{ data.percentile|round(1) }}th percentile</span><br>
-                <small style="color: #666;">
-                    Rank {{ data.rank|comma }} of {{ data.total_donors|comma }}<br>
-                    Total: {{ data.total_amount|currency }}
-                </small>
-            </div>
-            {% endfor %}
-        </div>
-        <p style="font-size: 0.8em; color: #888; margin-top: 10px; margin-bottom: 0;">
-            Higher percentile = higher rank among donors. Rankings based on yearly total contributions.
-        </p>
-    </div>
-    {% elif zip_code %}
-    <div style="background-color: #fff3cd; padding: 10px; border-radius: 4px; margin: 15px 0; font-size: 0.9em;">
-        📊 Percentile rankings will be available after running the CA percentile table builder script.
-    </div>
-    {% endif %}
-    
-    <div class="results-summary">
-      Showing {{ (page - 1) * PAGE_SIZE + 1 if total_results > 0 else 0 }} - {{ [page * PAGE_SIZE, total_results]|min }} of {{ total_results }} contributions.
-    </div>
-        <table>
-      <tr><th>Date</th><th>Recipient</th><th>Amount</th><th>Type</th>
-          <th>City</th><th>State</th><th>ZIP</th></tr>
-      {% for r_date, r_name, r_amt, r_cmte_id, r_city, r_state, r_zip in rows %}
-        <tr>
-          <td>{{ r_date }}</td>
-          <td>
-              <a href="/committee/{{ r_cmte_id }}">{{ r_name }}</a>
-              <a href="https://www.google.com/search?q={{ r_name|quote_plus }}" class="info-link" target="_blank" title="Search Google for {{ r_name }}">&#x24D8;</a>
-          </td>
-          <td>{{ r_amt|currency }}</td>
-          <td>CA Committee</td>
-          <td>{{ r_city }}</td>
-          <td>{{ r_state }}</td>
-          <td>{{ r_zip }}</td>
-            </tr>
-            {% endfor %}
-        </table>
-    {% if total_pages > 1 %}
-    <div class="pagination">
-        {% if page > 1 %}
-            <a href="{{ base_pagination_url }}&page={{ page - 1 }}">&laquo; Previous</a>
-        {% endif %}
-        <span>Page {{ page }} of {{ total_pages }}</span>
-        {% if page < total_pages %}
-            <a href="{{ base_pagination_url }}&page={{ page + 1 }}">Next &raquo;</a>
-        {% endif %}
-    </div>
-    {% endif %}
-</body>
-</html>
-"""
-
-SEARCH_RECIPIENTS_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Search CA Recipients</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 20px; background-color: #f4f7f6; color: #333; }
-        h1, h2 { color: #2c3e50; margin-bottom: 20px; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        .nav-links { margin-bottom: 20px; }
-        .nav-links a { margin-right: 15px; font-size: 1.1em; display: inline-block; }
-        form { background-color: #fff; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 30px; display: flex; flex-wrap: wrap; gap: 15px; align-items: center; }
-        form input[type="text"], form input[type="date"], form select { padding: 10px; border: 1px solid #ddd; border-radius: 4px; font-size: 1em; flex-grow: 1; min-width: 120px; }
-        form input[type="submit"], button { background-color: #e67e22; color: white; padding: 10px 15px; border: none; border-radius: 4px; cursor: pointer; font-size: 1em; }
-        form input[type="submit"]:hover, button:hover { background-color: #d35400; }
-        table { width: 100%; border-collapse: collapse; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); border-radius: 8px; margin-top: 20px; }
-        th, td { padding: 12px 15px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #eaf2f8; color: #333; font-weight: 600; }
-        tr:nth-child(even) { background-color: #f9f9f9; }
-        tr:hover { background-color: #f1f1f1; }
-    </style>
-</head>
-<body>
-    <h1>🏛️ CA Campaign Finance</h1>
-    <div class="nav-links">
-        <a href="/">💰 Contribution Search</a>
-        <a href="/search_recipients">🏢 Recipient Search</a>
-        <a href="/personsearch">👤 Person Search</a>
-        <a href="{{ build_fec_app_url('/search_recipients', {'name_query': name_query, 'sort_by': sort_by}) }}" style="color: #3498db;" target="_blank">🇺🇸 Search Federal Recipients</a>
-    </div>
-        <h2>Search Recipients by Name</h2>
-        <form method="get">
-            <input name="name_query" placeholder="Search recipient names..." value="{{ name_query }}" style="flex-grow: 1;">
-            <select name="sort_by">
-                <option value="recent_activity" {% if sort_by == 'recent_activity' %}selected{% endif %}>Recent Activity</option>
-                <option value="total_activity" {% if sort_by == 'total_activity' %}selected{% endif %}>Total Activity</option>
-                <option value="alphabetical" {% if sort_by == 'alphabetical' %}selected{% endif %}>Alphabetical</option>
-            </select>
-            <input type="submit" value="Search">
-        </form>
-
-        {% if name_query %}
-            {% if results %}
-                <h3>Results</h3>
-                <div class="results-summary">
-                    Showing {{ (page - 1) * PAGE_SIZE + 1 }} - {{ [page * PAGE_SIZE, total_results]|min }} of {{ total_results }} recipients.
-                </div>
-                <table>
-                    <tr>
-                        <th>Recipient</th><th>Type</th><th>Recent Activity</th><th>Total Activity</th><th>Last Contribution</th>
-                    </tr>
-                    {% for committee_id, name, type, total_contrib, total_amt, recent_contrib, recent_amt, last_date in results %}
-                    <tr>
-                        <td><a href="/committee/{{ committee_id }}">{{ name }}</a></td>
-                        <td>{{ type if type else "Unknown" }}</td>
-                        <td>
-                            {% if recent_contrib > 0 %}
-                                {{ recent_contrib|comma }} contrib<br>
-                                <small>{{ recent_amt|currency }}</small>
-                            {% else %}
-                                <span style="color: #999;">No recent activity</span>
-                            {% endif %}
-                        </td>
-                        <td>
-                            {% if total_contrib > 0 %}
-                                {{ total_contrib|comma }} contrib<br>
-                                <small>{{ total_amt|currency }}</small>
-                            {% else %}
-                                <span style="color: #999;">No data</span>
-                            {% endif %}
-                        </td>
-                        <td>{{ last_date if last_date else "Unknown" }}</td>
-                    </tr>
-                    {% endfor %}
-                </table>
-                {% if total_pages > 1 %}
-                <div class="pagination">
-                    {% set base_url = "/search_recipients?name_query=" + name_query + "&" + query_params_without_page %}
-                    {% if page > 1 %}
-                        <a href="{{ base_url }}&page={{ page - 1 }}">&laquo; Previous</a>
-                    {% endif %}
-                    <span>Page {{ page }} of {{ total_pages }}</span>
-                    {% if page < total_pages %}
-                        <a href="{{ base_url }}&page={{ page + 1 }}">Next &raquo;</a>
-                    {% endif %}
-                </div>
-                {% endif %}
-            {% else %}
-                <p>No recipients found for "{{ name_query }}".</p>
-            {% endif %}
-        {% endif %}
-</body>
-</html>
-"""
-
-PERSON_SEARCH_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>CA Person Search</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 20px; background-color: #f4f7f6; color: #333; }
-        h1, h2 { color: #2c3e50; margin-bottom: 20px; }
-        h1 { text-align: center; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        .nav-links { text-align: center; margin-bottom: 25px; }
-        .nav-links a { margin: 0 10px; font-size: 1.1em; }
-        form { background-color: #fff; padding: 25px; border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); max-width: 600px; margin: 0 auto; }
-        .form-group { margin-bottom: 18px; }
-        .form-group label { display: block; margin-bottom: 6px; font-weight: 500; color: #333; }
-        .form-group input[type="text"], .form-group input[type="email"], .form-group input[type="tel"] { 
-            width: 100%; 
-            padding: 10px; 
-            border: 1px solid #ddd; 
-            border-radius: 4px;
-            box-sizing: border-box; 
-            font-size: 1em; 
-        }
-        .form-group input:focus { border-color: #3498db; outline: none; box-shadow: 0 0 0 2px rgba(52, 152, 219, 0.2); }
-        .required-note { font-size: 0.9em; color: #555; margin-bottom: 20px; }
-        input[type="submit"] { background-color: #e67e22; color: white; padding: 12px 20px; border: none; border-radius: 4px; cursor: pointer; font-size: 1.1em; width: 100%; margin-top: 10px; transition: background-color 0.2s ease; }
-        input[type="submit"]:hover { background-color: #d35400; }
-        .optional-fields { border-top: 1px dashed #ccc; margin-top: 20px; padding-top: 20px; }
-        .optional-fields h3 { color: #666; margin-bottom: 15px; font-size: 1.1em; }
-        .loading-indicator { display: none; color: #e67e22; font-weight: bold; text-align: center; margin-top: 15px; }
-    </style>
-</head>
-<body>
-    <h1>CA Person Search</h1>
-    <div class="nav-links">
-        <a href="/">🔍 Contribution Search</a>
-        <a href="/search_recipients">👥 Recipient Search</a>
-        <a href="/personsearch">👤 New Person Search</a>
-        <a href="http://localhost:5000/personsearch" style="color: #3498db;" target="_blank">🇺🇸 Federal Person Search</a>
-    </div>
-    <form method="get" action="/person" onsubmit="document.getElementById('searchButton').disabled = true; document.getElementById('loading').style.display = 'block';">
-            <div class="form-group">
-                <label for="first">First Name:</label>
-                <input type="text" id="first" name="first" required>
-            </div>
-            <div class="form-group">
-                <label for="last">Last Name:</label>
-                <input type="text" id="last" name="last" required>
-            </div>
-        <p class="required-note">First and Last Name are required.</p>
-            
-            <div class="optional-fields">
-            <h3>Optional Details (for more specific searches)</h3>
-            <div class="form-group">
-                <label for="street">Street Address:</label>
-                <input type="text" id="street" name="street">
-            </div>
-                <div class="form-group">
-                    <label for="city">City:</label>
-                    <input type="text" id="city" name="city">
-                </div>
-                <div class="form-group">
-                    <label for="state">State:</label>
-                <input type="text" id="state" name="state" maxlength="2" size="4" style="width: auto;">
-                <small>(Defaults to CA if blank)</small>
-                </div>
-                <div class="form-group">
-                    <label for="zip">ZIP Code:</label>
-                <input type="text" id="zip" name="zip" pattern="[0-9]{5}(-[0-9]{4})?" title="Enter a 5-digit or 9-digit ZIP code">
-                </div>
-                <div class="form-group">
-                    <label for="phone">Phone Number:</label>
-                <input type="tel" id="phone" name="phone" pattern="[0-9\\-\\+\\s\\(\\)]*" title="Enter a valid phone number">
-                </div>
-                <div class="form-group">
-                    <label for="email">Email Address:</label>
-                    <input type="email" id="email" name="email">
-                </div>
-            </div>
-
-        <input type="submit" value="Search Person" id="searchButton">
-        <div id="loading" class="loading-indicator">Searching...</div>
-        </form>
-</body>
-</html>
-"""
-
-PERSON_RESULTS_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Profile for {{ original_form_params.first_name }} {{ original_form_params.last_name }}</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 0; padding: 0; background-color: #f4f7f6; color: #333; display: flex; flex-direction: column; min-height: 100vh; }
-        .container { max-width: 900px; margin: 20px auto; padding: 20px; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); border-radius: 8px; flex-grow: 1; }
-        h1, h2 { color: #2c3e50; margin-bottom: 15px; }
-        h1 { margin-bottom: 5px; word-break: break-word; }
-        .sub-header { font-size: 1.1em; color: #555; margin-bottom: 20px; }
-        .search-params { font-size: 0.9em; color: #555; margin-bottom: 10px; padding: 10px; background-color: #f9f9f9; border-radius: 4px; border: 1px solid #eee; word-break: break-word;}
-        .search-params strong { color: #333; }
-        .db-cascade-info { margin: 0 0 10px 0; font-size: 0.85em; color: #e67e22; font-style: italic; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        table { width: 100%; border-collapse: collapse; margin-top: 15px; margin-bottom: 30px; }
-        th, td { padding: 10px 12px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #eaf2f8; color: #333; font-weight: 600; }
-        tr:nth-child(even) { background-color: #f9f9f9; }
-        tr:hover { background-color: #f1f1f1; }
-        .google-search-section { margin-top: 30px; border-top: 2px solid #ddd; padding-top: 20px; }
-        .google-search-section h2 { margin-bottom: 15px; font-size: 1.3em; }
-        iframe { border: 1px solid #ccc; width: 100%; height: 500px; margin-bottom: 20px; }
-        .no-results { color: #e74c3c; font-style: italic; }
-        .nav-link { display: inline-block; background-color: #3498db; color: white !important; padding: 10px 15px; border-radius: 4px; font-size: 1em; text-decoration: none; margin-top:20px;}
-        .nav-link:hover { background-color: #2980b9; text-decoration: none; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <a href="/personsearch" class="nav-link" style="float: right; margin-top:0;">↩ New Person Search Form</a>
-        <h1>{{ original_form_params.first_name }} {{ original_form_params.last_name }}</h1>
-        
-        <div class="search-params">
-            <strong>Search Parameters (from form):</strong><br>
-            First Name: {{ original_form_params.first_name }}<br>
-            Last Name: {{ original_form_params.last_name }}<br>
-            {% if original_form_params.street %}Street: {{ original_form_params.street }}<br>{% endif %}
-            {% if original_form_params.city %}City: {{ original_form_params.city }}<br>{% endif %}
-            {% if original_form_params.state %}State: {{ original_form_params.state }}<br>{% endif %}
-            {% if original_form_params.zip_code %}ZIP: {{ original_form_params.zip_code }}<br>{% endif %}
-            {% if original_form_params.phone %}Phone: {{ original_form_params.phone }}<br>{% endif %}
-            {% if original_form_params.email %}Email: {{ original_form_params.email }}{% endif %}
-        </div>
-
-        <div class="sub-header">Total CA Contributions (matching DB criteria, excluding passthroughs): <strong>{{ total_amount|currency }}</strong></div>
-        {% if db_cascade_message %}<div class="db-cascade-info"><strong>{{ db_cascade_message }}</strong></div>{% endif %}
-
-        <h2>Recent CA Contributions ({{ recent_contributions|length }})</h2>
-        {% if recent_contributions %}
-            <table>
-                <tr><th>Date</th><th>Recipient</th><th>Amount</th><th>Contributor Location</th></tr>
-                {% for contrib in recent_contributions %}
-                    <tr>
-                        <td>{{ contrib[0] }}</td>
-                        <td>
-                           <a href="/committee/{{ contrib[3] }}" target="_blank" title="View recipient details">{{ contrib[1] }}</a>
-                        </td>
-                        <td>{{ contrib[2]|currency }}</td>
-                        <td>{{ contrib[4] }}, {{ contrib[5] }} {{ contrib[6] }}</td>
-                    </tr>
-                {% endfor %}
-            </table>
-        {% else %}
-            <p class="no-results">{{ no_results_message }}</p>
-        {% endif %}
-
-        {% if google_search_url_address %}
-        <div class="google-search-section">
-            <h2>Google Search: Name + Address</h2>
-            <p><em>Searching for: {{ google_search_query_address }}</em></p>
-            <iframe src="{{ google_search_url_address }}" title="Google Search Results for {{ google_search_query_address }}"></iframe>
-        </div>
-        {% endif %}
-
-        {% if google_search_url_phone %}
-        <div class="google-search-section">
-            <h2>Google Search: Name + Phone</h2>
-            <p><em>Searching for: {{ google_search_query_phone }}</em></p>
-            <iframe src="{{ google_search_url_phone }}" title="Google Search Results for {{ google_search_query_phone }}"></iframe>
-        </div>
-        {% endif %}
-
-        {% if google_search_url_email %}
-        <div class="google-search-section">
-            <h2>Google Search: Name + Email</h2>
-            <p><em>Searching for: {{ google_search_query_email }}</em></p>
-            <iframe src="{{ google_search_url_email }}" title="Google Search Results for {{ google_search_query_email }}"></iframe>
-        </div>
-        {% endif %}
-
-        {% if google_search_url_name_city %}
-        <div class="google-search-section">
-            <h2>Google Search: Name + City</h2>
-            <p><em>Searching for: {{ google_search_query_name_city }}</em></p>
-            <iframe src="{{ google_search_url_name_city }}" title="Google Search Results for {{ google_search_query_name_city }}"></iframe>
-        </div>
-        {% endif %}
-
-    </div>
-</body>
-</html>
-"""
-
-RECIPIENT_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Top Contributors to {{ recipient_name }}</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 20px; background-color: #f4f7f6; color: #333; }
-        h1, h2 { color: #2c3e50; margin-bottom: 20px; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        .nav-links a { margin-right: 15px; font-size: 1.1em; display: inline-block; margin-bottom:20px;}
-        table { width: 100%; border-collapse: collapse; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); border-radius: 8px; margin-top: 20px; }
-        th, td { padding: 12px 15px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #eaf2f8; color: #333; font-weight: 600; }
-        tr:nth-child(even) { background-color: #f9f9f9; }
-        tr:hover { background-color: #f1f1f1; }
-        .pagination { margin: 25px 0; text-align: center; clear: both; }
-        .pagination a, .pagination span { display: inline-block; padding: 8px 14px; margin: 0 4px; border: 1px solid #ddd; border-radius: 4px; color: #3498db; text-decoration: none; font-size: 0.95em; }
-        .pagination a:hover { background-color: #eaf2f8; border-color: #c5ddec; }
-        .pagination .current-page { background-color: #3498db; color: white; border-color: #3498db; font-weight: bold; }
-        .results-summary { margin: 20px 0 10px 0; font-size: 0.9em; color: #555; }
-        .info-link { text-decoration: none; margin-left: 5px; font-size: 0.9em; color: #7f8c8d; }
-        .info-link:hover { color: #3498db; }
-    </style>
-</head>
-<body>
-    <h1>Top Contributors to {{ recipient_name }}</h1>
-    <p style="color: #666; margin-bottom: 20px;"><em>Showing all-time contribution totals across all years in database</em></p>
-    <div class="nav-links">
-        <a href="/">🔍 New Search</a>
-        <a href="/search_recipients">👥 Search Recipients by Name</a>
-        <a href="/personsearch">👤 Person Search</a>
-        <a href="http://localhost:5000/search_recipients" style="color: #3498db;" target="_blank">🇺🇸 Search Federal Recipients</a>
-    </div>
-    <div class="results-summary">
-      Showing top {{ (page - 1) * PAGE_SIZE + 1 if total_results > 0 else 0 }} - {{ [page * PAGE_SIZE, total_results]|min }} of {{ total_results }} contributors.
-        </div>
-    <table>
-      <tr><th>First</th><th>Last</th><th>Total Contributed<br><small>(All Time)</small></th></tr>
-      {% for fn, ln, total in rows %}
-        <tr>
-          <td><a href="/contributor?first={{ fn }}&last={{ ln }}">{{ fn }}</a></td>
-          <td><a href="/contributor?first={{ fn }}&last={{ ln }}">{{ ln }}</a></td>
-          <td>{{ total|currency }}</td>
-        </tr>
-      {% endfor %}
-    </table>
-    {% if total_pages > 1 %}
-    <div class="pagination">
-        {% set base_url = "/recipient?committee_id=" + committee_id + "&" + query_params_without_page %}
-        {% if page > 1 %}
-            <a href="{{ base_url }}&page={{ page - 1 }}">&laquo; Previous</a>
-        {% endif %}
-        <span>Page {{ page }} of {{ total_pages }}</span>
-        {% if page < total_pages %}
-            <a href="{{ base_url }}&page={{ page + 1 }}">Next &raquo;</a>
-        {% endif %}
-        </div>
-    {% endif %}
-</body>
-</html>
-"""
-
-COMMITTEE_TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ committee_name }} - CA Committee</title>
-    <style>
-        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 20px; background-color: #f4f7f6; color: #333; }
-        h1, h2 { color: #2c3e50; margin-bottom: 20px; }
-        a { color: #3498db; text-decoration: none; }
-        a:hover { text-decoration: underline; }
-        .nav-links { margin-bottom: 20px; }
-        .nav-links a { margin-right: 15px; font-size: 1.1em; display: inline-block; }
-        .committee-info { background: #fff; padding: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); margin-bottom: 20px; }
-        table { width: 100%; border-collapse: collapse; background-color: #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.1); border-radius: 8px; margin-top: 20px; }
-        th, td { padding: 12px 15px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background-color: #eaf2f8; color: #333; font-weight: 600; }
-        tr:nth-child(even) { background-color: #f9f9f9; }
-        tr:hover { background-color: #f1f1f1; }
-        .stats { background: #e8f5e8; padding: 15px; border-radius: 4px; margin-bottom: 20px; }
-    </style>
-</head>
-<body>
-    <h1>🏛️ CA Campaign Finance</h1>
-    <div class="nav-links">
-        <a href="/">💰 Contribution Search</a>
-        <a href="/search_recipients">🏢 Recipient Search</a>
-        <a href="/personsearch">👤 Person Search</a>
-        <a href="http://localhost:5000/" style="color: #3498db;" target="_blank">🇺🇸 Search Federal Data</a>
-    </div>
-    
-    <div class="committee-info">
-        <h1>{{ committee_name }}</h1>
-        <p><strong>Committee ID:</strong> {{ committee_id }}</p>
-        <p><strong>Type:</strong> {{ committee_type if committee_type else "Unknown" }}</p>
-        <p><a href="/">← Back to Search</a></p>
-    </div>
-    
-    <div class="stats">
-        <strong>Total Contributions:</strong> {{ total_count|comma }} contributions, {{ total_amount|currency }}
-        {% if total_count >= 1000 %}<br><em>Showing most recent 1,000 contributions</em>{% endif %}
-    </div>
-    
-    <form method="get" style="margin-bottom: 20px; background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-        <label for="sort_by" style="margin-right: 10px;">Sort by:</label>
-        <select name="sort_by" id="sort_by" onchange="this.form.submit()" style="padding: 8px; border: 1px solid #ddd; border-radius: 4px;">
-            <option value="date_desc" {% if sort_by == 'date_desc' %}selected{% endif %}>Date (newest)</option>
-            <option value="date_asc" {% if sort_by == 'date_asc' %}selected{% endif %}>Date (oldest)</option>
-            <option value="amount_desc" {% if sort_by == 'amount_desc' %}selected{% endif %}>Amount (highest)</option>
-            <option value="amount_asc" {% if sort_by == 'amount_asc' %}selected{% endif %}>Amount (lowest)</option>
-        </select>
-    </form>
-    
-    {% if contributions %}
-        <table>
-            <tr>
-                <th><a href="/committee/{{ committee_id }}?{{ committee_query_without_sort }}&sort_by={{ 'date_desc' if sort_by != 'date_desc' else 'date_asc' }}">Date</a></th>
-                <th>Contributor</th>
-                <th>Location</th>
-                <th><a href="/committee/{{ committee_id }}?{{ committee_query_without_sort }}&sort_by={{ 'amount_desc' if sort_by != 'amount_desc' else 'amount_asc' }}">Amount</a></th>
-                <th>Employer/Occupation</th>
-            </tr>
-            {% for date, first, last, city, state, amount, employer, occupation in contributions %}
-            <tr>
-                <td>{{ date }}</td>
-                <td><a href="/contributor?first={{ first }}&last={{ last }}">{{ first }} {{ last }}</a></td>
-                <td>{{ city }}{% if city and state %}, {% endif %}{{ state }}</td>
-                <td>{{ amount|currency }}</td>
-                <td>{{ employer }}{% if employer and occupation %} / {% endif %}{{ occupation }}</td>
-            </tr>
-            {% endfor %}
-        </table>
-    {% else %}
-        <p>No contributions found for this committee.</p>
-    {% endif %}
-</body>
-</html>
-"""
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run California Contribution Search App')
     parser.add_argument('--public', action='store_true', 
@@ -1626,5 +1333,6 @@ if __name__ == "__main__":
     host = '0.0.0.0' if args.public else '127.0.0.1'
     debug = False if args.public else True
     
+    init_db()
     print(f"🚀 Starting California app on http://{host}:5001")
     app.run(debug=debug, host=host, port=5001)
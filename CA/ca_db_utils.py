@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Shared SQLite helpers for the California build scripts.
+"""
+
+import hashlib
+import math
+
+
+def tune_conn(conn):
+    """Apply pragmas for bulk aggregation builds.
+
+    WAL avoids the rollback-journal fsync on every commit, and the large
+    page cache / mmap window keep the GROUP BY and ORDER BY working sets
+    in memory instead of spilling to temp files. Close with close_build_conn().
+    """
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA journal_mode = WAL;')
+    cursor.execute('PRAGMA synchronous = NORMAL;')
+    cursor.execute('PRAGMA cache_size = -524288;')  # 512 MB
+    cursor.execute('PRAGMA mmap_size = 1073741824;')  # 1 GB
+    cursor.execute('PRAGMA temp_store = MEMORY;')
+
+
+def close_build_conn(conn):
+    """Checkpoint the WAL, return the file to rollback-journal mode and close.
+
+    journal_mode=WAL persists in the database file, and update_calaccess.py
+    swaps only the main file into place, so a build must not leave -wal/-shm
+    sidecars behind for the next reader to pair with the wrong file.
+    """
+    conn.commit()
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA wal_checkpoint(TRUNCATE);')
+    cursor.execute('PRAGMA journal_mode = DELETE;')
+    conn.close()
+
+
+def tune_read_conn(conn):
+    """Apply pragmas for read-only lookups against the built tables."""
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA query_only = 1;')
+    cursor.execute('PRAGMA cache_size = -65536;')  # 64 MB
+
+
+DONOR_KEY_EXPR = "first_name || '|' || last_name || '|' || substr(zip_code, 1, 5)"
+
+
+def ensure_donor_key_column(conn):
+    """Add the virtual donor_key column and its index to contributions if missing.
+
+    donor_key is "first_name|last_name|zip5", the same key used by
+    ca_donor_totals_by_year, so aggregations can group on it directly
+    instead of rebuilding the string for every row.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'donor_key' not in columns:
+        print("🔧 Adding donor_key column to contributions...")
+        cursor.execute(f"ALTER TABLE contributions ADD COLUMN donor_key TEXT GENERATED ALWAYS AS ({DONOR_KEY_EXPR}) VIRTUAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_donor_key_date ON contributions (donor_key, contribution_date)")
+
+
+CONTRIBUTION_YEAR_EXPR = "CAST(substr(contribution_date, 1, 4) AS INTEGER)"
+
+
+def ensure_contribution_year_column(conn):
+    """Add the virtual contribution_year column and its indexes to contributions if missing.
+
+    A year filter on the search page becomes one integer equality probe
+    instead of a string range over contribution_date.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'contribution_year' not in columns:
+        print("🔧 Adding contribution_year column to contributions...")
+        cursor.execute(f"ALTER TABLE contributions ADD COLUMN contribution_year INTEGER GENERATED ALWAYS AS ({CONTRIBUTION_YEAR_EXPR}) VIRTUAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_year_date ON contributions (contribution_year, contribution_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_name_year_date ON contributions (first_name, last_name, contribution_year, contribution_date)")
+
+
+UPPER_COLUMNS = ('first_name', 'last_name', 'city', 'state')
+
+
+def ensure_upper_columns(conn):
+    """Add virtual upper-case copies of the name/location columns and their indexes.
+
+    first_name_u, last_name_u, city_u and state_u let case-insensitive
+    searches use plain equality on an index instead of COLLATE NOCASE,
+    which can't use the BINARY indexes on the raw columns.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    columns = [row[1] for row in cursor.fetchall()]
+    for column in UPPER_COLUMNS:
+        if f'{column}_u' not in columns:
+            print(f"🔧 Adding {column}_u column to contributions...")
+            cursor.execute(f"ALTER TABLE contributions ADD COLUMN {column}_u TEXT GENERATED ALWAYS AS (upper({column})) VIRTUAL")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_name_u ON contributions (last_name_u, first_name_u, state_u, city_u, contribution_date)")
+    # Person search's cascade levels: with ZIP, and with city and ZIP dropped
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_person_zip ON contributions (last_name_u, first_name_u, state_u, city_u, zip5, contribution_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_person_state ON contributions (last_name_u, first_name_u, state_u, contribution_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_name_u_date ON contributions (last_name_u, first_name_u, contribution_date)")
+
+
+def ensure_zip5_column(conn):
+    """Add and backfill the zip5 column on contributions if missing.
+
+    process_ca.py fills zip5 at ingest (first five characters of zip_code,
+    NULL when shorter), so queries can filter and group on it without
+    per-row substr/length calls. Older databases get the same values here.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'zip5' not in columns:
+        print("🔧 Adding zip5 column to contributions...")
+        cursor.execute("ALTER TABLE contributions ADD COLUMN zip5 TEXT")
+        cursor.execute("UPDATE contributions SET zip5 = substr(zip_code, 1, 5) WHERE length(zip_code) >= 5")
+        conn.commit()
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ca_zip5_date ON contributions (zip5, contribution_date)")
+
+
+RECIPIENT_TRIGGERS_SQL = """
+CREATE TRIGGER IF NOT EXISTS committees_recipient_ai AFTER INSERT ON committees BEGIN
+    UPDATE contributions SET recipient_name = new.name, recipient_committee_type = new.committee_type
+    WHERE recipient_committee_id = new.committee_id;
+END;
+CREATE TRIGGER IF NOT EXISTS committees_recipient_au AFTER UPDATE OF name, committee_type ON committees BEGIN
+    UPDATE contributions SET recipient_name = new.name, recipient_committee_type = new.committee_type
+    WHERE recipient_committee_id = new.committee_id;
+END;
+"""
+
+
+def ensure_recipient_columns(conn):
+    """Add and backfill the denormalized committee name/type on contributions.
+
+    The search page reads recipient_name and recipient_committee_type straight
+    from contributions instead of joining committees for every row. Triggers
+    on committees keep the copies current when a committee is added or renamed.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_xinfo(contributions)")
+    columns = [row[1] for row in cursor.fetchall()]
+    for column in ('recipient_name', 'recipient_committee_type'):
+        if column not in columns:
+            print(f"🔧 Adding {column} column to contributions...")
+            cursor.execute(f"ALTER TABLE contributions ADD COLUMN {column} TEXT")
+    cursor.executescript(RECIPIENT_TRIGGERS_SQL)
+    cursor.execute("""
+        UPDATE contributions
+        SET recipient_name = cm.name, recipient_committee_type = cm.committee_type
+        FROM committees cm
+        WHERE contributions.recipient_committee_id = cm.committee_id
+          AND contributions.recipient_name IS NULL
+    """)
+    conn.commit()
+
+
+def contributions_etag(cursor):
+    """Cheap fingerprint of the contributions table: max rowid, row count, latest date."""
+    cursor.execute("SELECT MAX(rowid), COUNT(*), MAX(contribution_date) FROM contributions")
+    max_rowid, count, max_date = cursor.fetchone()
+    return f"{max_rowid}:{count}:{max_date}"
+
+
+def _ensure_build_metadata(cursor):
+    """Create the table that records which data each derived table was built from."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS build_metadata (
+            name TEXT PRIMARY KEY,
+            etag TEXT,
+            built_at TEXT
+        )
+    """)
+
+
+def get_build_etag(cursor, name):
+    """Return the etag recorded for a derived table's last build, or None."""
+    _ensure_build_metadata(cursor)
+    cursor.execute("SELECT etag FROM build_metadata WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_build_etag(cursor, name, etag):
+    """Record the etag of the data a derived table was built from."""
+    _ensure_build_metadata(cursor)
+    cursor.execute("""
+        INSERT OR REPLACE INTO build_metadata (name, etag, built_at)
+        VALUES (?, ?, datetime('now'))
+    """, (name, etag))
+
+
+class HyperLogLogDistinct:
+    """Approximate COUNT(DISTINCT ...) aggregate for sqlite3.create_aggregate.
+
+    Keeps a fixed 4096-register sketch per group (about 1.6% standard
+    error) instead of the exact hash set SQLite builds for every group.
+    """
+
+    PRECISION = 12
+    REGISTERS = 1 << PRECISION
+
+    def __init__(self):
+        self.registers = bytearray(self.REGISTERS)
+
+    def step(self, value):
+        if value is None:
+            return
+        # hash() is the identity for small ints and salted per process for str,
+        # so take 64 well-mixed, stable bits from blake2b instead
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.PRECISION)
+        rest = h & ((1 << (64 - self.PRECISION)) - 1)
+        rank = (64 - self.PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def finalize(self):
+        m = self.REGISTERS
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small groups
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def register_approx_distinct(conn):
+    """Register hll_distinct(x) on a connection."""
+    conn.create_aggregate("hll_distinct", 1, HyperLogLogDistinct)
@@ -24,8 +24,20 @@ CREATE TABLE IF NOT EXISTS ca_percentile_thresholds_by_year (
     PRIMARY KEY (year, percentile)
 );
 
+-- Per-donor rank within each year, so lookups don't count the whole year
+CREATE TABLE IF NOT EXISTS ca_donor_rank_by_year (
+    donor_key TEXT NOT NULL,  -- "first_name|last_name|zip5"
+    year INTEGER NOT NULL,
+    rank INTEGER NOT NULL,  -- 1 = largest total that year; ties share a rank
+    total_donors INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    contribution_count INTEGER NOT NULL,
+    PRIMARY KEY (donor_key, year)
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_ca_donor_totals_year ON ca_donor_totals_by_year (year);
-CREATE INDEX IF NOT EXISTS idx_ca_donor_totals_amount ON ca_donor_totals_by_year (year, total_amount DESC);
+-- idx_ca_donor_totals_amount (year, total_amount DESC) is created by
+-- build_ca_percentile_tables.py after the bulk load
 CREATE INDEX IF NOT EXISTS idx_ca_donor_totals_donor_key ON ca_donor_totals_by_year (donor_key);
 CREATE INDEX IF NOT EXISTS idx_ca_percentile_thresholds_year ON ca_percentile_thresholds_by_year (year);
@@ -18,6 +18,45 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(SCRIPT_DIR, "ca_contributions.db")
 CVR_FILE = os.path.join(SCRIPT_DIR, "CalAccess", "DATA", "CVR_CAMPAIGN_DISCLOSURE_CD.TSV")
 
+FCM_FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS fcm_fts USING fts5(
+    committee_name,
+    content='filing_committee_mapping',
+    content_rowid='rowid',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS fcm_fts_insert AFTER INSERT ON filing_committee_mapping
+BEGIN
+    INSERT INTO fcm_fts(rowid, committee_name) VALUES (new.rowid, new.committee_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS fcm_fts_delete AFTER DELETE ON filing_committee_mapping
+BEGIN
+    INSERT INTO fcm_fts(fcm_fts, rowid, committee_name) VALUES ('delete', old.rowid, old.committee_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS fcm_fts_update AFTER UPDATE ON filing_committee_mapping
+BEGIN
+    INSERT INTO fcm_fts(fcm_fts, rowid, committee_name) VALUES ('delete', old.rowid, old.committee_name);
+    INSERT INTO fcm_fts(rowid, committee_name) VALUES (new.rowid, new.committee_name);
+END;
+"""
+
+def create_fcm_fts(conn):
+    """Build the trigram FTS index that serves substring searches on committee_name.
+
+    Trigram tokenizing needs SQLite 3.34+; on older builds the app keeps using LIKE.
+    """
+    try:
+        conn.executescript(FCM_FTS_SQL)
+        conn.execute("INSERT INTO fcm_fts(fcm_fts) VALUES('rebuild')")
+        conn.commit()
+        return True
+    except sqlite3.OperationalError as e:
+        print(f"⚠️  Skipping committee name FTS index: {e}")
+        return False
+
 def create_filing_committee_mapping():
     """Create a mapping table from FILING_ID to committee information."""
     print("🔧 Creating FILING_ID to committee mapping...")
@@ -25,6 +64,11 @@ def create_filing_committee_mapping():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # One-shot bulk load: the table is rebuilt from the TSV if the load is interrupted
+    cursor.execute('PRAGMA synchronous = OFF;')
+    cursor.execute('PRAGMA cache_size = -200000;')  # ~200 MB
+    cursor.execute('PRAGMA temp_store = MEMORY;')
+    
     # Create the mapping table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS filing_committee_mapping (
@@ -36,62 +80,77 @@ def create_filing_committee_mapping():
         )
     """)
     
-    # Clear existing data
+    # The FTS sync triggers would fire for every deleted and inserted row;
+    # create_fcm_fts re-adds them and rebuilds the index once after the load
+    cursor.execute("DROP TRIGGER IF EXISTS fcm_fts_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS fcm_fts_delete")
+    cursor.execute("DROP TRIGGER IF EXISTS fcm_fts_update")
+    
+    # Clear existing data; the DELETE and every insert below share one transaction
     cursor.execute("DELETE FROM filing_committee_mapping")
     
     print("📋 Processing CVR_CAMPAIGN_DISCLOSURE_CD.TSV...")
     
     with open_readable(CVR_FILE, encoding='utf-8', errors='replace', null_clean=True) as f:
-        reader = csv.DictReader(f, delimiter='\t')
+        # Plain rows indexed by header position; no per-row dict
+        reader = csv.reader(f, delimiter='\t')
+        columns = {name: i for i, name in enumerate(next(reader, []))}
+        i_filing_id = columns['FILING_ID']
+        i_filer_id = columns['FILER_ID']
+        i_name_parts = tuple(columns[part] for part in ('FILER_NAML', 'FILER_NAMF', 'FILER_NAMT', 'FILER_NAMS'))
+        i_entity_code = columns['ENTITY_CD']
+        i_committee_type = columns['CMTTE_TYPE']
         batch = []
         
         for row in reader:
+            if not row:
+                continue
             try:
-                filing_id = row.get('FILING_ID', '').strip()
-                filer_id = row.get('FILER_ID', '').strip()
+                filing_id = row[i_filing_id].strip()
+                filer_id = row[i_filer_id].strip()
                 
                 if not filing_id:
                     continue
                 
                 # Build committee name
-                name_parts = []
-                for part in ['FILER_NAML', 'FILER_NAMF', 'FILER_NAMT', 'FILER_NAMS']:
-                    if row.get(part, '').strip():
-                        name_parts.append(row.get(part, '').strip())
+                name_parts = [part for part in (row[i].strip() for i in i_name_parts) if part]
                 
                 committee_name = ' '.join(name_parts) if name_parts else f"Filing ID: {filing_id}"
                 
                 # Map entity and committee types
-                entity_code = row.get('ENTITY_CD', '').strip()
-                committee_type = row.get('CMTTE_TYPE', '').strip()
+                entity_code = row[i_entity_code].strip()
+                committee_type = row[i_committee_type].strip()
                 
                 batch.append((filing_id, filer_id, committee_name, entity_code, committee_type))
                 
-                if len(batch) >= 1000:
+                if len(batch) >= 50000:
                     cursor.executemany("""
                         INSERT OR REPLACE INTO filing_committee_mapping 
                         (filing_id, filer_id, committee_name, entity_code, committee_type)
                         VALUES (?, ?, ?, ?, ?)
                     """, batch)
-                    conn.commit()
                     batch = []
                     
             except Exception as e:
                 print(f"Warning: Error processing row: {e}")
                 continue
         
-        # Final commit
+        # Final batch, then a single commit for the whole load
         if batch:
             cursor.executemany("""
                 INSERT OR REPLACE INTO filing_committee_mapping 
                 (filing_id, filer_id, committee_name, entity_code, committee_type)
                 VALUES (?, ?, ?, ?, ?)
             """, batch)
-            conn.commit()
+        conn.commit()
     
     # Create index
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_filing_committee_mapping ON filing_committee_mapping (filing_id)")
     
+    # Full-text index for the recipient search fallback
+    if create_fcm_fts(conn):
+        print("✅ Built committee name FTS index")
+    
     # Show statistics
     cursor.execute("SELECT COUNT(*) FROM filing_committee_mapping")
     mapping_count = cursor.fetchone()[0]
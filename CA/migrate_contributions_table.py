@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
 """
-Migration script to add candidate columns to existing contributions table
+Migration script to add candidate and recipient columns to existing contributions table
 """
 
 import sqlite3
 
+from ca_db_utils import ensure_contribution_year_column, ensure_recipient_columns, ensure_upper_columns
+
+COMMITTEE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_ca_recipient_date_amount ON contributions (recipient_committee_id, contribution_date DESC, amount DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_ca_recipient_amount_date ON contributions (recipient_committee_id, amount DESC, contribution_date DESC)',
+]
+
 def migrate_contributions_table():
     """Add new candidate columns to existing contributions table."""
     
@@ -23,18 +30,42 @@ def migrate_contributions_table():
         'jurisdiction_description TEXT'
     ]
     
-    for column_def in new_columns:
-        column_name = column_def.split()[0]
-        if column_name not in columns:
-            try:
-                cursor.execute(f"ALTER TABLE contributions ADD COLUMN {column_def}")
-                print(f"✅ Added column: {column_name}")
-            except Exception as e:
-                print(f"❌ Error adding column {column_name}: {e}")
-        else:
-            print(f"⏩ Column {column_name} already exists")
+    # All ADD COLUMNs in one transaction: one commit and one schema change for open connections.
+    # sqlite3 doesn't open a transaction for DDL on its own, hence the explicit BEGIN.
+    with conn:
+        cursor.execute("BEGIN")
+        for column_def in new_columns:
+            column_name = column_def.split()[0]
+            if column_name not in columns:
+                try:
+                    cursor.execute(f"ALTER TABLE contributions ADD COLUMN {column_def}")
+                    print(f"✅ Added column: {column_name}")
+                except Exception as e:
+                    print(f"❌ Error adding column {column_name}: {e}")
+            else:
+                print(f"⏩ Column {column_name} already exists")
+    
+    # Denormalized committee name/type used by the search page
+    ensure_recipient_columns(conn)
+    print("✅ Recipient names filled")
+    
+    # Integer year used by the search page's year filter
+    ensure_contribution_year_column(conn)
+    conn.commit()
+    print("✅ Contribution year column ready")
+    
+    # Upper-case name/location copies for case-insensitive searches
+    ensure_upper_columns(conn)
+    conn.commit()
+    print("✅ Upper-case search columns ready")
     
+    # Committee page sorts (newest / largest first) walk these and stop at LIMIT 1000
+    for idx_sql in COMMITTEE_INDEXES:
+        cursor.execute(idx_sql)
+    cursor.execute("ANALYZE contributions")
     conn.commit()
+    print("✅ Committee page indexes ready")
+    
     conn.close()
     print("🎯 Migration complete!")
 
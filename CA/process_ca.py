@@ -12,6 +12,13 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from zstd_utils import open_readable
+from ca_db_utils import (
+    ensure_contribution_year_column,
+    ensure_donor_key_column,
+    ensure_recipient_columns,
+    ensure_upper_columns,
+    ensure_zip5_column,
+)
 
 # Optional progress bar
 try:
@@ -42,6 +49,9 @@ def create_database():
     cursor.execute('PRAGMA cache_size = -8000;')
     cursor.execute('PRAGMA temp_store = DEFAULT;')
 
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='contributions'")
+    existing_contributions = cursor.fetchone() is not None
+
     # Create main contributions table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS contributions (
@@ -66,10 +76,26 @@ def create_database():
             candidate_last_name TEXT,
             candidate_first_name TEXT,
             office_description TEXT,
-            jurisdiction_description TEXT
+            jurisdiction_description TEXT,
+            zip5 TEXT,
+            recipient_name TEXT,
+            recipient_committee_type TEXT,
+            first_name_u TEXT GENERATED ALWAYS AS (upper(first_name)) VIRTUAL,
+            last_name_u TEXT GENERATED ALWAYS AS (upper(last_name)) VIRTUAL,
+            city_u TEXT GENERATED ALWAYS AS (upper(city)) VIRTUAL,
+            state_u TEXT GENERATED ALWAYS AS (upper(state)) VIRTUAL,
+            contribution_year INTEGER GENERATED ALWAYS AS (CAST(substr(contribution_date, 1, 4) AS INTEGER)) VIRTUAL,
+            donor_key TEXT GENERATED ALWAYS AS (first_name || '|' || last_name || '|' || substr(zip_code, 1, 5)) VIRTUAL
         )
     ''')
 
+    if existing_contributions:
+        # CREATE TABLE IF NOT EXISTS keeps an older schema; add the columns the inserts and create_indexes() expect
+        ensure_zip5_column(conn)
+        ensure_donor_key_column(conn)
+        ensure_upper_columns(conn)
+        ensure_contribution_year_column(conn)
+
     # Create committees table for recipient information
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS committees (
@@ -298,9 +324,9 @@ def process_contributions(conn):
                 if entity_code != 'IND':
                     continue
                 
-                # Parse contributor name
-                last_name = row.get('CTRIB_NAML', '').strip()
-                first_name = row.get('CTRIB_NAMF', '').strip()
+                # Parse contributor name (stored uppercase, matching how searches normalize input)
+                last_name = row.get('CTRIB_NAML', '').strip().upper()
+                first_name = row.get('CTRIB_NAMF', '').strip().upper()
                 
                 # Skip if no name
                 if not last_name and not first_name:
@@ -331,6 +357,9 @@ def process_contributions(conn):
                 except (ValueError, TypeError):
                     cumulative_ytd = 0.0
 
+                zip_code = row.get('CTRIB_ZIP4', '').strip()
+                zip5 = zip_code[:5] if len(zip_code) >= 5 else None
+
                 batch.append((
                     row.get('FILING_ID', '').strip(),
                     int(row.get('AMEND_ID', '0') or '0'),
@@ -339,7 +368,7 @@ def process_contributions(conn):
                     last_name,
                     row.get('CTRIB_CITY', '').strip(),
                     row.get('CTRIB_ST', '').strip(),
-                    row.get('CTRIB_ZIP4', '').strip(),
+                    zip_code,
                     row.get('CTRIB_EMP', '').strip(),
                     row.get('CTRIB_OCC', '').strip(),
                     contribution_date,
@@ -353,7 +382,8 @@ def process_contributions(conn):
                     row.get('CAND_NAML', '').strip(),  # Candidate last name
                     row.get('CAND_NAMF', '').strip(),  # Candidate first name
                     row.get('OFFIC_DSCR', '').strip(), # Office description
-                    row.get('JURIS_DSCR', '').strip()  # Jurisdiction description
+                    row.get('JURIS_DSCR', '').strip(), # Jurisdiction description
+                    zip5
                 ))
 
                 processed_count += 1
@@ -366,8 +396,9 @@ def process_contributions(conn):
                             contribution_date, amount, recipient_committee_id,
                             recipient_type, entity_code, transaction_type,
                             cumulative_ytd, transaction_id, candidate_last_name,
-                            candidate_first_name, office_description, jurisdiction_description
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            candidate_first_name, office_description, jurisdiction_description,
+                            zip5
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     ''', batch)
                     conn.commit()
                     batch = []
@@ -385,8 +416,9 @@ def process_contributions(conn):
                     contribution_date, amount, recipient_committee_id,
                     recipient_type, entity_code, transaction_type,
                     cumulative_ytd, transaction_id, candidate_last_name,
-                    candidate_first_name, office_description, jurisdiction_description
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    candidate_first_name, office_description, jurisdiction_description,
+                    zip5
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', batch)
             conn.commit()
 
@@ -400,11 +432,28 @@ def create_indexes(conn):
     
     indexes = [
         'CREATE INDEX IF NOT EXISTS idx_ca_name ON contributions (first_name, last_name)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_name_date ON contributions (first_name, last_name, contribution_date)',
         'CREATE INDEX IF NOT EXISTS idx_ca_location ON contributions (city, state, zip_code)',
         'CREATE INDEX IF NOT EXISTS idx_ca_contrib_date ON contributions (contribution_date)',
         'CREATE INDEX IF NOT EXISTS idx_ca_recipient ON contributions (recipient_committee_id)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_recipient_name ON contributions (recipient_committee_id, first_name, last_name)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_recipient_date_amount ON contributions (recipient_committee_id, contribution_date DESC, amount DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_recipient_amount_date ON contributions (recipient_committee_id, amount DESC, contribution_date DESC)',
         'CREATE INDEX IF NOT EXISTS idx_ca_flz_plus_date ON contributions (first_name, last_name, zip_code, contribution_date)',
         'CREATE INDEX IF NOT EXISTS idx_ca_flz_plus_amount ON contributions (first_name, last_name, zip_code, amount)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_name_city_date ON contributions (first_name, last_name, city, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_name_state_date ON contributions (first_name, last_name, state, contribution_date)',
+        # Partial indexes skip the many rows with no city / ZIP; searches add the matching <> '' term
+        "CREATE INDEX IF NOT EXISTS idx_ca_city_nonempty ON contributions (city, last_name, first_name) WHERE city IS NOT NULL AND city <> ''",
+        "CREATE INDEX IF NOT EXISTS idx_ca_zip_nonempty ON contributions (zip_code, last_name, first_name) WHERE zip_code IS NOT NULL AND zip_code <> ''",
+        'CREATE INDEX IF NOT EXISTS idx_ca_donor_key_date ON contributions (donor_key, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_zip5_date ON contributions (zip5, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_year_date ON contributions (contribution_year, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_name_u ON contributions (last_name_u, first_name_u, state_u, city_u, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_person_zip ON contributions (last_name_u, first_name_u, state_u, city_u, zip5, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_person_state ON contributions (last_name_u, first_name_u, state_u, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_name_u_date ON contributions (last_name_u, first_name_u, contribution_date)',
+        'CREATE INDEX IF NOT EXISTS idx_ca_name_year_date ON contributions (first_name, last_name, contribution_year, contribution_date)',
         'CREATE INDEX IF NOT EXISTS idx_ca_committee_id ON committees (committee_id)',
         'CREATE INDEX IF NOT EXISTS idx_ca_committee_name ON committees (name)'
     ]
@@ -412,6 +461,8 @@ def create_indexes(conn):
     for idx_sql in indexes:
         cursor.execute(idx_sql)
     
+    # Refresh planner statistics so the composite indexes are chosen
+    cursor.execute('ANALYZE')
     conn.commit()
     print("✅ Indexes created")
 
@@ -470,6 +521,10 @@ def main():
         process_committees(conn)
         process_contributions(conn)
         
+        # Copy committee name/type onto contributions so searches skip the join
+        print("🔧 Filling recipient names...")
+        ensure_recipient_columns(conn)
+        
         # Create indexes
         create_indexes(conn)
         
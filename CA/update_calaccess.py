@@ -216,6 +216,7 @@ def build_new_database(logger):
         sys.path.insert(0, SCRIPT_DIR)
 
         import process_ca
+        from ca_db_utils import ensure_recipient_columns
         # Save original and patch
         orig_db = process_ca.DB_FILE
         process_ca.DB_FILE = DB_NEW_FILE
@@ -224,6 +225,8 @@ def build_new_database(logger):
         conn = process_ca.create_database()
         process_ca.process_committees(conn)
         process_ca.process_contributions(conn)
+        # Copy committee name/type onto contributions, as process_ca.main() does
+        ensure_recipient_columns(conn)
         process_ca.create_indexes(conn)
         conn.close()
 
@@ -254,6 +257,7 @@ def build_new_database(logger):
         build_ca_percentile_tables.DB_FILE = DB_NEW_FILE
         build_ca_percentile_tables.build_ca_donor_totals_by_year()
         build_ca_percentile_tables.build_ca_percentile_thresholds()
+        build_ca_percentile_tables.build_ca_donor_rank_by_year()
         build_ca_percentile_tables.DB_FILE = orig_db
         logger.info("Percentile tables complete")
     except Exception as e:
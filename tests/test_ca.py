@@ -0,0 +1,419 @@
+"""
+Tests for the California apps and build scripts.
+Each test class builds a small synthetic CalAccess database in a temp directory.
+"""
+
+import contextlib
+import html
+import io
+import logging
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add project root and CA/ to path
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+sys.path.insert(0, os.path.join(PROJECT_DIR, "CA"))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import build_ca_percentile_tables
+    import ca_app
+    import ca_app_simple
+    import process_ca
+    import update_calaccess
+    from ca_db_utils import HyperLogLogDistinct, ensure_recipient_columns
+
+COMMITTEE_IDS = [str(1000000 + i) for i in range(12)]
+FIRST_NAMES = ["JOHN", "JANE", "ALEX"]
+LAST_NAMES = ["SMITH", "KIM", "LEE"]
+CITIES = ["LOS ANGELES", "SAN FRANCISCO", "CUPERTINO"]
+ZIPS = ["90210", "94102", "95014-1234", ""]
+
+
+def quiet(func, *args, **kwargs):
+    """Call func with its progress output suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def create_test_db(path, rows=3000, seed=7):
+    """Build a CA database with process_ca's schema and indexes.
+
+    Dates and amounts come from small sets so the sort keys have many
+    ties, and a few rows have a NULL date or amount.
+    """
+    orig_db = process_ca.DB_FILE
+    process_ca.DB_FILE = path
+    try:
+        conn = quiet(process_ca.create_database)
+    finally:
+        process_ca.DB_FILE = orig_db
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO committees (committee_id, name, committee_type) VALUES (?, ?, ?)",
+        [(cid, f"COMMITTEE {cid}", "RCP") for cid in COMMITTEE_IDS],
+    )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS filing_committee_mapping (
+            filing_id TEXT PRIMARY KEY, filer_id TEXT, committee_name TEXT,
+            entity_code TEXT, committee_type TEXT
+        )
+    """)
+    cursor.executemany(
+        "INSERT INTO filing_committee_mapping VALUES (?, ?, ?, ?, ?)",
+        [(cid, cid, f"FILER {cid}", "RCP", "CTL") for cid in COMMITTEE_IDS],
+    )
+
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(contributions)")}
+    rng = random.Random(seed)
+    names = ["first_name", "last_name", "city", "state", "zip_code", "contribution_date",
+             "amount", "recipient_committee_id", "entity_code"]
+    if "zip5" in columns:
+        names.append("zip5")
+    values = []
+    for _ in range(rows):
+        zip_code = rng.choice(ZIPS)
+        date = f"{rng.choice([2022, 2023, 2024])}-{rng.randint(1, 3):02d}-01"
+        amount = float(rng.choice([5, 25, 100, 250]))
+        if rng.random() < 0.05:
+            date = None
+        if rng.random() < 0.05:
+            amount = None
+        row = [rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(CITIES), "CA", zip_code,
+               date, amount, rng.choice(COMMITTEE_IDS), "IND"]
+        if "zip5" in columns:
+            row.append(zip_code[:5] or None)
+        values.append(row)
+    cursor.executemany(
+        f"INSERT INTO contributions ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", values
+    )
+    conn.commit()
+    quiet(process_ca.create_indexes, conn)
+    quiet(ensure_recipient_columns, conn)
+    conn.close()
+
+
+def table_rows(body):
+    """Result rows of the last table on a page."""
+    table = body.split("<table>")[-1].split("</table>")[0]
+    return re.findall(r"<tr>\s*<td>.*?</tr>", table, re.S)
+
+
+def next_link(body):
+    """URL of the page's "Next" link, or None on the last page."""
+    match = re.search(r'<a href="([^"]*)">Next', body)
+    return html.unescape(match.group(1)) if match else None
+
+
+class CADatabaseTestBase(unittest.TestCase):
+    """Builds one shared test database for a test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.db_path = os.path.join(cls.tmp_dir, "ca_test.db")
+        create_test_db(cls.db_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def count(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class TestCAAppKeysetPagination(CADatabaseTestBase):
+    """ca_app's "Next" links seek past the last row instead of using OFFSET."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.orig_db_path = ca_app.DB_PATH
+        ca_app.DB_PATH = cls.db_path
+        ca_app.app.config["TESTING"] = True
+        cls.client = ca_app.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        ca_app.DB_PATH = cls.orig_db_path
+        super().tearDownClass()
+
+    def get(self, url):
+        response = quiet(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def walk(self, query):
+        """Follow the "Next" links from the first page, checking each page against its OFFSET version."""
+        url = f"/?{query}"
+        page = 1
+        seen = 0
+        while url:
+            body = self.get(url)
+            rows = table_rows(body)
+            # Same page number without a cursor falls back to LIMIT/OFFSET
+            self.assertEqual(rows, table_rows(self.get(f"/?{query}&page={page}")), f"{query} page {page}")
+            seen += len(rows)
+            url = next_link(body)
+            page += 1
+        return seen
+
+    def test_every_sort_walks_all_rows(self):
+        expected = self.count("SELECT COUNT(*) FROM contributions WHERE last_name = 'KIM'")
+        for sort_by in ("contribution_date", "amount"):
+            for order in ("desc", "asc"):
+                with self.subTest(sort_by=sort_by, order=order):
+                    self.assertEqual(self.walk(f"last_name=KIM&sort_by={sort_by}&order={order}"), expected)
+
+    def test_keyset_page_reports_full_total(self):
+        body = self.get("/?last_name=KIM")
+        total = self.count("SELECT COUNT(*) FROM contributions WHERE last_name = 'KIM'")
+        self.assertIn(f"of {total} contributions", self.get(next_link(body)))
+
+    def test_cascade_drops_zip(self):
+        body = self.get("/?last_name=KIM&zip_code=00000")
+        self.assertIn("Results found after dropping ZIP Code filter", body)
+        self.assertTrue(table_rows(body))
+
+
+class TestCAAppSimple(CADatabaseTestBase):
+    """ca_app_simple's /contributor paging and /person cascade."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.orig_db_path = ca_app_simple.DB_PATH
+        ca_app_simple.DB_PATH = cls.db_path
+        ca_app_simple.app.config["TESTING"] = True
+        cls.client = ca_app_simple.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        ca_app_simple.DB_PATH = cls.orig_db_path
+        super().tearDownClass()
+
+    def get(self, url):
+        response = quiet(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def test_contributor_keyset_matches_offset(self):
+        expected = self.count("SELECT COUNT(*) FROM contributions WHERE first_name = 'JOHN' AND last_name = 'SMITH'")
+        for sort_by in ("date_desc", "date_asc"):
+            with self.subTest(sort_by=sort_by):
+                url = f"/contributor?first=JOHN&last=SMITH&sort_by={sort_by}"
+                pages = 0
+                seen = 0
+                while url:
+                    body = self.get(url)
+                    rows = table_rows(body)
+                    if pages:
+                        self.assertIn("after_rowid=", url)
+                    offset_url = re.sub(r"&after_date=[^&]*&after_rowid=\d+", "", url)
+                    self.assertEqual(rows, table_rows(self.get(offset_url)), url)
+                    seen += len(rows)
+                    pages += 1
+                    url = next_link(body)
+                self.assertGreater(pages, 1)
+                self.assertEqual(seen, expected)
+
+    def cascade_rows(self, attempts):
+        """Rows and level from _person_cascade_sql for (city, zip) attempts."""
+        shapes = []
+        params = []
+        for city, zip_code in attempts:
+            zip_clause, zip_params = ca_app_simple._zip_filter(zip_code) if zip_code else ("", [])
+            shapes.append((bool(city), zip_clause))
+            params += ["JOHN", "KIM"] + ([city] if city else []) + ["CA"] + list(zip_params)
+            params += ca_app_simple.KNOWN_CA_CONDUITS + [ca_app_simple.PERSON_SEARCH_PAGE_SIZE]
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(ca_app_simple._person_cascade_sql(tuple(shapes)), params).fetchall()
+            # Each attempt on its own, as a standalone query
+            separate = []
+            for (city, zip_code), shape in zip(attempts, shapes):
+                zip_params = ca_app_simple._zip_filter(zip_code)[1] if zip_code else []
+                separate.append(conn.execute(
+                    ca_app_simple._person_recent_sql(*shape),
+                    ["JOHN", "KIM"] + ([city] if city else []) + ["CA"] + list(zip_params)
+                    + ca_app_simple.KNOWN_CA_CONDUITS + [ca_app_simple.PERSON_SEARCH_PAGE_SIZE],
+                ).fetchall())
+        finally:
+            conn.close()
+        return rows, separate
+
+    def test_person_cascade_returns_first_matching_level(self):
+        cases = [
+            [("CUPERTINO", "95014"), ("CUPERTINO", ""), ("", "")],  # first level matches
+            [("CUPERTINO", "00000"), ("CUPERTINO", ""), ("", "")],  # ZIP dropped
+            [("NOWHERE", "00000"), ("NOWHERE", ""), ("", "")],      # city and ZIP dropped
+        ]
+        for attempts in cases:
+            with self.subTest(attempts=attempts):
+                rows, separate = self.cascade_rows(attempts)
+                level = next(i for i, level_rows in enumerate(separate) if level_rows)
+                self.assertTrue(rows)
+                self.assertEqual({row["cascade_level"] for row in rows}, {level})
+                self.assertEqual([tuple(row)[1:] for row in rows], [tuple(row) for row in separate[level]])
+
+    def test_person_cascade_no_match(self):
+        rows, separate = self.cascade_rows([("NOWHERE", "00000"), ("NOWHERE", "")])
+        self.assertEqual(rows, [])
+        self.assertEqual(separate, [[], []])
+
+    def test_person_route_reports_dropped_zip(self):
+        body = self.get("/person?first=JOHN&last=KIM&city=CUPERTINO&zip=00000")
+        self.assertIn("after dropping ZIP code filter", body)
+
+
+class TestPercentileThresholds(unittest.TestCase):
+    """The numpy and SQL threshold builders must store the same thresholds."""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        with open(os.path.join(PROJECT_DIR, "CA", "ca_percentile_tables.sql")) as f:
+            self.conn.executescript(f.read())
+        rng = random.Random(3)
+        totals = []
+        for year in (2020, 2022, 2024):
+            for i in range(rng.randint(150, 400)):
+                # Few distinct totals, so the target ranks land inside ties
+                totals.append((f"D{i}|X|90210", year, float(rng.choice([10, 50, 50, 100, 500, 2500])), 1, "D", "X", "90210"))
+        # A one-donor year, where every position clamps to rank 1
+        totals.append(("SOLO|X|90210", 2019, 75.0, 1, "SOLO", "X", "90210"))
+        self.conn.executemany("""
+            INSERT INTO ca_donor_totals_by_year
+            (donor_key, year, total_amount, contribution_count, first_name, last_name, zip5)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, totals)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def thresholds(self, store):
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM ca_percentile_thresholds_by_year")
+        self.conn.commit()
+        cursor.execute("SELECT year, COUNT(*) FROM ca_donor_totals_by_year GROUP BY year ORDER BY year")
+        year_counts = cursor.fetchall()
+        positions = [
+            (year, percentile, int((percentile / 100.0) * total_donors) or 1)
+            for year, total_donors in year_counts
+            for percentile in (1, 5, 10, 25, 50, 75, 90, 95, 99)
+        ]
+        store(cursor, year_counts, positions)
+        self.conn.commit()
+        cursor.execute("""
+            SELECT year, percentile, amount_threshold, donor_count_at_threshold
+            FROM ca_percentile_thresholds_by_year ORDER BY year, percentile
+        """)
+        return cursor.fetchall()
+
+    @unittest.skipIf(build_ca_percentile_tables.np is None, "numpy not installed")
+    def test_numpy_matches_sql(self):
+        sql = self.thresholds(lambda cursor, year_counts, positions:
+                              build_ca_percentile_tables._store_thresholds_sql(cursor, positions))
+        numpy = self.thresholds(build_ca_percentile_tables._store_thresholds_numpy)
+        self.assertEqual(len(sql), 4 * 9)
+        self.assertEqual(numpy, sql)
+
+
+class TestHyperLogLogDistinct(unittest.TestCase):
+    """Approximate distinct counts stay close for int and str keys."""
+
+    def estimate(self, values):
+        hll = HyperLogLogDistinct()
+        for value in values:
+            hll.step(value)
+        return hll.finalize()
+
+    def test_int_keys(self):
+        self.assertLess(abs(self.estimate(range(10000)) - 10000), 500)
+        # Consecutive ints must not land in a handful of registers
+        self.assertLess(abs(self.estimate(range(0, 200000, 2)) - 100000), 5000)
+
+    def test_str_keys(self):
+        self.assertLess(abs(self.estimate(f"DONOR {i}|90210" for i in range(10000)) - 10000), 500)
+
+    def test_small_sets_and_duplicates(self):
+        self.assertEqual(self.estimate([]), 0)
+        self.assertEqual(self.estimate([None, None]), 0)
+        self.assertEqual(self.estimate(["A", "B", "A", None, "C"]), 3)
+        self.assertEqual(self.estimate(list(range(50)) * 3), 50)
+
+    def test_sql_aggregate(self):
+        conn = sqlite3.connect(":memory:")
+        conn.create_aggregate("approx_distinct", 1, HyperLogLogDistinct)
+        conn.execute("CREATE TABLE t (g INTEGER, k TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(i % 2, f"K{i % 700}") for i in range(5000)])
+        counts = dict(conn.execute("SELECT g, approx_distinct(k) FROM t GROUP BY g"))
+        conn.close()
+        self.assertLess(abs(counts[0] - 350), 10)
+        self.assertLess(abs(counts[1] - 350), 10)
+
+
+class TestUpdateCalaccessBuild(unittest.TestCase):
+    """update_calaccess builds a database with recipient_name filled in."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        data_dir = os.path.join(self.tmp_dir, "DATA")
+        os.makedirs(data_dir)
+        with open(os.path.join(data_dir, "CVR_CAMPAIGN_DISCLOSURE_CD.TSV"), "w") as f:
+            f.write("FILING_ID\tFILER_ID\tFILER_NAML\tENTITY_CD\n")
+            f.write("9001\t700030\tFRIENDS OF ALICE\tCTL\n")
+            f.write("9002\t600056\tBOB FOR SENATE\tCTL\n")
+        with open(os.path.join(data_dir, "RCPT_CD.TSV"), "w") as f:
+            f.write("FILING_ID\tAMEND_ID\tLINE_ITEM\tENTITY_CD\tCTRIB_NAML\tCTRIB_NAMF\tCTRIB_ZIP4\t"
+                    "RCPT_DATE\tAMOUNT\tCMTE_ID\tTRAN_ID\n")
+            f.write("9001\t0\t1\tIND\tSmith\tJohn\t94110\t1/2/2024 12:00:00 AM\t100\t\tT1\n")
+            f.write("9002\t0\t1\tIND\tDoe\tJane\t90210\t3/4/2023\t250\t\tT2\n")
+
+        self.new_db = os.path.join(self.tmp_dir, "ca_contributions.db.new")
+        self.patches = [
+            (process_ca, "DATA_DIR", data_dir),
+            (process_ca, "DB_FILE", os.path.join(self.tmp_dir, "unused.db")),
+            (update_calaccess, "DATA_DIR", data_dir),
+            (update_calaccess, "DB_NEW_FILE", self.new_db),
+        ]
+        self.originals = [(module, name, getattr(module, name)) for module, name, _ in self.patches]
+        for module, name, value in self.patches:
+            setattr(module, name, value)
+
+    def tearDown(self):
+        for module, name, value in self.originals:
+            setattr(module, name, value)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_recipient_name_backfilled(self):
+        logger = logging.getLogger("test_update_calaccess")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        self.assertTrue(quiet(update_calaccess.build_new_database, logger))
+
+        conn = sqlite3.connect(self.new_db)
+        try:
+            rows = conn.execute("""
+                SELECT last_name, recipient_name FROM contributions ORDER BY last_name
+            """).fetchall()
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual(rows, [("DOE", "BOB FOR SENATE"), ("SMITH", "FRIENDS OF ALICE")])
+        self.assertEqual(journal_mode, "delete")
+
+
+if __name__ == "__main__":
+    unittest.main()